@@ -0,0 +1,125 @@
+# audio_segmentation.py
+"""Silence trimming before Whisper
+
+A vectorised energy pass marks 30 ms frames as speech when their RMS is
+well above the recording's noise floor, or at most 20 dB below its loud
+speech when the recording has no real pauses. Short clicks are dropped, short
+pauses are kept inside a segment, and each segment is padded so word
+onsets survive. Only the speech segments are decoded; a TimestampMap
+moves Whisper's segment and word times back onto the original recording.
+
+Set TRIM_SILENCE=0 to decode recordings untouched.
+"""
+import os
+from collections import namedtuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+TRIM_SILENCE = os.getenv("TRIM_SILENCE", "1") != "0"
+
+# Part of the result cache version: trimming changes what Whisper sees
+CACHE_TAG = "trim2" if TRIM_SILENCE else "full"
+
+# Sample offsets [start, end) into the original recording
+Segment = namedtuple("Segment", ["start", "end"])
+
+
+def frame_energy(audio, frame_samples):
+    """RMS of every whole frame"""
+    usable = audio.size // frame_samples * frame_samples
+    frames = audio[:usable].reshape(-1, frame_samples)
+    return np.sqrt(np.mean(frames ** 2, axis=1))
+
+
+def _runs(mask):
+    """Start and end indices of the True runs in a boolean array"""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+
+def speech_segments(audio, sample_rate=SAMPLE_RATE, frame_ms=30, min_rms=0.005, floor_ratio=3.0,
+                    speech_ratio=0.1, min_speech_ms=150, min_silence_ms=700, padding_ms=200):
+    """Speech regions of a mono recording as Segments, in order"""
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    frame = int(frame_ms * sample_rate / 1000)
+    energy = frame_energy(audio, frame)
+    if energy.size == 0:
+        return []
+
+    # Above the noise floor (the quietest tenth), so room noise is not speech, but
+    # capped 20 dB under loud speech: with no real pauses the quietest tenth is
+    # itself speech, and a quieter speaker must not be cut out
+    floor, loud = np.percentile(energy, [10, 95])
+    threshold = max(min_rms, min(float(floor) * floor_ratio, float(loud) * speech_ratio))
+    starts, ends = _runs(energy >= threshold)
+
+    # Drop clicks and bumps too short to be a word
+    keep = ends - starts >= max(1, min_speech_ms // frame_ms)
+    starts, ends = starts[keep], ends[keep]
+    if starts.size == 0:
+        return []
+
+    # Pad each run, then merge runs separated by less than min_silence_ms
+    pad = padding_ms // frame_ms
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, energy.size)
+    split = starts[1:] - ends[:-1] >= min_silence_ms // frame_ms
+    starts = starts[np.concatenate(([True], split))]
+    ends = ends[np.concatenate((split, [True]))]
+
+    segments = [Segment(int(start) * frame, int(end) * frame) for start, end in zip(starts, ends)]
+    if ends[-1] == energy.size:
+        # Keep the partial frame at the end of the recording
+        segments[-1] = Segment(segments[-1].start, audio.size)
+    return segments
+
+
+class TimestampMap:
+    """Maps times in the trimmed audio back to the original recording"""
+
+    def __init__(self, segments, sample_rate=SAMPLE_RATE):
+        lengths = np.array([end - start for start, end in segments], dtype=np.float64)
+        self.trimmed_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1])) / sample_rate
+        self.original_starts = np.array([start for start, _ in segments], dtype=np.float64) / sample_rate
+        self.original_ends = np.array([end for _, end in segments], dtype=np.float64) / sample_rate
+
+    def to_original(self, seconds, end=False):
+        """Original time of a trimmed time; an end falling on a join stays in the earlier segment"""
+        side = "left" if end else "right"
+        index = max(0, int(np.searchsorted(self.trimmed_starts, seconds, side=side)) - 1)
+        original = self.original_starts[index] + seconds - self.trimmed_starts[index]
+        return float(min(original, self.original_ends[index]))
+
+
+def trim_silence(audio, sample_rate=SAMPLE_RATE, **options):
+    """Speech-only audio and the TimestampMap back to the input, or (None, None) if all silent"""
+    audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+    segments = speech_segments(audio, sample_rate, **options)
+    if not segments:
+        return None, None
+    trimmed = np.concatenate([audio[start:end] for start, end in segments])
+    return trimmed, TimestampMap(segments, sample_rate)
+
+
+def transcribe(model, audio, **options):
+    """model.transcribe on the speech in a 16 kHz buffer (or file), timed against the original"""
+    if not TRIM_SILENCE:
+        return model.transcribe(audio, **options)
+    if isinstance(audio, str):
+        import whisper
+        audio = whisper.load_audio(audio)
+
+    trimmed, timestamps = trim_silence(audio)
+    if trimmed is None:
+        # Nothing to decode; Whisper would only hallucinate here
+        return {"text": "", "segments": [], "language": None}
+
+    result = model.transcribe(trimmed, **options)
+    for segment in result.get("segments", []):
+        segment["start"] = timestamps.to_original(segment["start"])
+        segment["end"] = timestamps.to_original(segment["end"], end=True)
+        for word in segment.get("words", []):
+            word["start"] = timestamps.to_original(word["start"])
+            word["end"] = timestamps.to_original(word["end"], end=True)
+    return result
@@ -0,0 +1,318 @@
+# batch_transcribe.py
+"""Backfill reports from archived recordings
+
+Transcribes a directory (or manifest) of audio files in a process pool,
+one Whisper model per worker, longest recordings first so the pool stays
+evenly loaded. Transcripts are analysed in batches in the parent and
+posted to the bulk endpoint. Every file the API confirms is appended to
+a checkpoint, so an interrupted run picks up where it stopped:
+
+    python batch_transcribe.py recordings/
+    python batch_transcribe.py manifest.jsonl --workers 4 --checkpoint backfill.jsonl
+
+A manifest lists one file per line, either as a bare path or as JSON
+({"path": ..., "timestamp": ...}); relative paths are resolved against
+the manifest's directory.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import time
+from datetime import datetime
+
+import requests
+import soundfile as sf
+from pydantic import ValidationError
+
+import instrumentation
+import model_registry
+import result_cache
+from transcription_queue import load_audio
+
+AUDIO_EXTENSIONS = (".wav", ".flac", ".ogg", ".mp3", ".m4a")
+
+# Resident memory of one transcribing worker (weights plus decode state), MB
+WHISPER_WORKER_MB = {"tiny": 500, "base": 700, "small": 1500, "medium": 3500, "large": 7000, "turbo": 4000}
+
+# The parent holds the zero-shot classifier and spaCy
+PARENT_RESERVE_MB = 2500
+
+# Names written by MedicalAnalyzerSystem.save_audio
+ARCHIVE_NAME = re.compile(r"(\d{8}_\d{6})")
+
+# Per-worker state, set up once by _init_worker
+_model = None
+_model_name = None
+_precision = None
+_cache = None
+
+
+def read_inputs(source):
+    """(path, timestamp or None) for every recording in a directory or manifest"""
+    if os.path.isdir(source):
+        inputs = []
+        for root, _, files in os.walk(source):
+            for name in sorted(files):
+                if name.lower().endswith(AUDIO_EXTENSIONS):
+                    inputs.append((os.path.abspath(os.path.join(root, name)), None))
+        return inputs
+
+    base = os.path.dirname(os.path.abspath(source))
+    inputs = []
+    with open(source, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                path, timestamp = entry["path"], entry.get("timestamp")
+            else:
+                path, timestamp = line, None
+            inputs.append((os.path.abspath(os.path.join(base, path)), timestamp))
+    return inputs
+
+
+def audio_duration(path):
+    """Length in seconds, estimated from the file size if soundfile cannot read it"""
+    try:
+        return sf.info(path).duration
+    except RuntimeError:
+        # Roughly 128 kbit/s compressed audio
+        return os.path.getsize(path) / 16000
+
+
+def recording_timestamp(path, timestamp=None):
+    """Manifest timestamp, else the time in an archive file name, else the file's mtime"""
+    if timestamp:
+        return timestamp
+    match = ARCHIVE_NAME.search(os.path.basename(path))
+    if match:
+        return datetime.strptime(match.group(1), "%Y%m%d_%H%M%S").isoformat()
+    return datetime.fromtimestamp(os.path.getmtime(path)).isoformat()
+
+
+def available_memory_mb():
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def pool_size(model_name, worker_mb=None):
+    """Workers that fit both the cores and the free memory"""
+    cpus = os.cpu_count() or 1
+    worker_mb = worker_mb or WHISPER_WORKER_MB.get(model_name.split(".")[0].split("-")[0], 3000)
+    memory = available_memory_mb()
+    if memory is None:
+        return cpus
+    return max(1, min(cpus, int((memory - PARENT_RESERVE_MB) // worker_mb)))
+
+
+def load_checkpoint(path):
+    """Recordings an earlier run already uploaded"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["path"])
+            except (ValueError, KeyError):
+                # A line cut short by a crash
+                continue
+    return done
+
+
+def _init_worker(model_name, precision, threads):
+    """Load one Whisper model per worker process"""
+    global _model, _model_name, _precision, _cache
+    if threads:
+        model_registry.set_inference_threads(threads)
+    _model = model_registry.get_whisper_model(model_name, precision=precision)
+    _model_name, _precision = model_name, precision
+    _cache = result_cache.get_cache()
+
+
+def _transcribe(item):
+    path, timestamp = item
+    try:
+        with instrumentation.job("batch_transcription", path=path, worker=os.getpid()) as timing:
+            with instrumentation.stage("load_audio"):
+                audio = load_audio(path)
+            with instrumentation.stage("transcribe"):
+                transcript = result_cache.cached_transcribe(_model, audio, _model_name, _precision, _cache)
+        return path, timestamp, transcript, timing.stages, None
+    except Exception as e:
+        return path, timestamp, None, [], str(e)
+
+
+class BatchUploader:
+    """Analyses finished transcripts in batches and posts them to the bulk endpoint
+
+    A recording is checkpointed only once the API reports it created;
+    anything rejected or not delivered is retried by the next run, which
+    finds the transcript in the result cache.
+    """
+
+    def __init__(self, analyzer, api_url, checkpoint_path, batch_size, retries=5, timeout=(5, 120)):
+        self.analyzer = analyzer
+        self.bulk_url = api_url.rstrip("/") + "/bulk"
+        self.batch_size = batch_size
+        self.retries = retries
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.pending = []
+        self.created = 0
+        self.rejected = 0
+        self.checkpoint = open(checkpoint_path, "a", encoding="utf-8")
+
+    def add(self, path, timestamp, transcript):
+        self.pending.append((path, timestamp, transcript))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        with instrumentation.stage("classify"):
+            analyses = self.analyzer.analyze_many([transcript for _, _, transcript in pending])
+
+        # Check every payload against the API's model before sending it
+        batch = []
+        for (path, timestamp, transcript), zero_shot in zip(pending, analyses):
+            try:
+                payload = self.analyzer.build_report(transcript, self.analyzer.extract_medical_entities(transcript),
+                                                     zero_shot, recording_timestamp(path, timestamp))
+            except ValidationError as e:
+                self.rejected += 1
+                print(f"{path}: invalid report, not uploaded: {e}")
+                continue
+            # A batch resent after a lost response is not stored twice
+            payload["idempotency_key"] = "backfill:" + hashlib.sha256(path.encode()).hexdigest()
+            batch.append((path, payload))
+        if not batch:
+            return
+
+        with instrumentation.stage("upload"):
+            results = self._post([payload for _, payload in batch])
+        for result in results:
+            path = batch[result["index"]][0]
+            if result["status"] == "created":
+                self.checkpoint.write(json.dumps({"path": path, "report_id": result.get("id")}) + "\n")
+                self.created += 1
+            else:
+                self.rejected += 1
+                print(f"{path}: rejected by the API: {result.get('error')}")
+        self.checkpoint.flush()
+        os.fsync(self.checkpoint.fileno())
+
+    def _post(self, reports):
+        """POST one bulk request, retrying transient failures; the per-item results"""
+        for attempt in range(self.retries + 1):
+            try:
+                response = self.session.post(self.bulk_url, json=reports, timeout=self.timeout)
+                if response.status_code < 400:
+                    return response.json()["results"]
+                error = f"HTTP {response.status_code}: {response.text[:200]}"
+                if response.status_code < 500 and response.status_code != 429:
+                    break
+            except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+                error = str(e)
+            if attempt < self.retries:
+                delay = 2 ** attempt
+                print(f"Upload failed ({error}); retrying in {delay}s")
+                time.sleep(delay)
+        raise RuntimeError(f"Could not upload {len(reports)} report(s) to {self.bulk_url}: {error}")
+
+    def close(self):
+        self.checkpoint.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe archived recordings and upload them as reports")
+    parser.add_argument("source", help="directory of recordings, or a manifest file")
+    parser.add_argument("--checkpoint", default="batch_transcribe.checkpoint.jsonl",
+                        help="file recording finished recordings, for resuming")
+    parser.add_argument("--workers", type=int, help="transcription processes (default: fit cores and memory)")
+    parser.add_argument("--worker-memory-mb", type=int, help="memory budget per worker used to size the pool")
+    parser.add_argument("--model", default="base", help="Whisper model name")
+    parser.add_argument("--whisper-precision", choices=["fp32", "fp16", "int8"],
+                        help="Whisper weights precision (default: $WHISPER_PRECISION or fp32)")
+    parser.add_argument("--batch-size", type=int, default=100,
+                        help="transcripts classified and uploaded in one bulk request")
+    parser.add_argument("--api-url", default="http://localhost:8000/api/reports")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this port while running")
+    args = parser.parse_args()
+    if args.metrics_port:
+        instrumentation.serve_metrics(args.metrics_port)
+
+    # Resume: skip anything an earlier run already uploaded
+    done = load_checkpoint(args.checkpoint)
+    inputs = [item for item in read_inputs(args.source) if item[0] not in done]
+    if not inputs:
+        print(f"Nothing to do ({len(done)} recording(s) already in {args.checkpoint})")
+        return
+
+    # Longest first, so the last jobs to start are the short ones
+    inputs.sort(key=lambda item: audio_duration(item[0]), reverse=True)
+
+    workers = args.workers or pool_size(args.model, args.worker_memory_mb)
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    print(f"Transcribing {len(inputs)} recording(s) with {workers} worker(s), {threads} thread(s) each "
+          f"({len(done)} already done)")
+
+    # Imported here so pool workers, which re-import this module, do not load it
+    from medical_analyzer import MedicalAnalyzerSystem
+    # Reports are posted directly, not through the analyzer's outbox, so only
+    # confirmed ones are checkpointed
+    analyzer = MedicalAnalyzerSystem(whisper_precision=args.whisper_precision, api_url=args.api_url)
+    uploader = BatchUploader(analyzer, args.api_url, args.checkpoint, args.batch_size)
+
+    failed = 0
+    started = time.perf_counter()
+    pool = multiprocessing.get_context("spawn").Pool(
+        workers, initializer=_init_worker, initargs=(args.model, args.whisper_precision, threads)
+    )
+    try:
+        for count, (path, timestamp, transcript, stages, error) in enumerate(
+                pool.imap_unordered(_transcribe, inputs), 1):
+            for stage in stages:
+                instrumentation.record_stage(stage)
+            if error is not None:
+                failed += 1
+                print(f"[{count}/{len(inputs)}] {path}: failed: {error}")
+                continue
+            print(f"[{count}/{len(inputs)}] {path}: {len(transcript)} characters")
+            uploader.add(path, timestamp, transcript)
+        pool.close()
+        uploader.flush()
+    except KeyboardInterrupt:
+        print("\nInterrupted; uploaded recordings are checkpointed, rerun to continue")
+        pool.terminate()
+    except RuntimeError as e:
+        print(f"{e}\nStopping; uploaded recordings are checkpointed, rerun to continue")
+        pool.terminate()
+    finally:
+        pool.join()
+        uploader.close()
+
+    elapsed = time.perf_counter() - started
+    print(f"Uploaded {uploader.created} report(s), {uploader.rejected} rejected, "
+          f"{failed} failed to transcribe, in {elapsed:.0f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# benchmark_api.py
+"""Load test the report API against a throwaway database
+
+Starts fastapi_backend under uvicorn on a fresh SQLite file (or the
+--database-url given, e.g. a local Postgres), applies the migrations,
+seeds it with synthetic reports through /api/reports/bulk and then drives
+the read endpoints with load_test.run. Reports p50/p95 latency, requests
+per second and the server's peak memory.
+
+    python benchmarks/benchmark_api.py --reports 5000 --output api.json
+    python benchmarks/benchmark_api.py --database-url postgresql://localhost/bench --compare api.json
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+from sqlalchemy import create_engine
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from migrations import migrate
+from load_test import run
+from common import synthetic_reports, summarize, print_table, write_results, compare
+
+DEFAULT_PATHS = [
+    "/api/reports/?limit=50",
+    "/api/reports/?limit=50&entity=symptoms:fever",
+    "/api/reports/stats",
+    "/api/reports/search?q=chest+pain",
+    "/api/reports/1"
+]
+
+
+def server_peak_rss_mb(pid):
+    """High-water RSS of another process (Linux only)"""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def start_server(database_url, port, log_path):
+    env = {**os.environ, "DATABASE_URL": database_url, "TRANSCRIPTION_WORKERS": "0"}
+    log = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fastapi_backend:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with {process.returncode}; see {log_path}")
+        try:
+            if httpx.get(f"{url}/test", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"server did not start within 60 s; see {log_path}")
+
+
+def seed(url, reports, batch_size):
+    """POST reports in bulk batches, timing each request"""
+    latencies = []
+    with httpx.Client(base_url=url, timeout=120) as client:
+        for start in range(0, len(reports), batch_size):
+            batch = reports[start:start + batch_size]
+            began = time.perf_counter()
+            response = client.post("/api/reports/bulk", json=batch)
+            latencies.append(time.perf_counter() - began)
+            response.raise_for_status()
+    return summarize(f"POST bulk x{batch_size}", latencies, items=len(reports))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the report API against a local database")
+    parser.add_argument("--database-url", help="database to use instead of a temporary SQLite file")
+    parser.add_argument("--reports", type=int, default=2000, help="synthetic reports to seed")
+    parser.add_argument("--batch-size", type=int, default=500, help="reports per bulk request")
+    parser.add_argument("--path", action="append", dest="paths", help="path to load test (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=10, help="seconds per path")
+    parser.add_argument("--port", type=int, default=18000)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="healthcloud-bench-")
+    database_url = args.database_url or f"sqlite:///{os.path.join(scratch, 'reports.sqlite3')}"
+    engine = create_engine(database_url)
+    migrate(engine)
+    engine.dispose()
+
+    process, url = start_server(database_url, args.port, os.path.join(scratch, "server.log"))
+    try:
+        results = [seed(url, synthetic_reports(args.reports), args.batch_size)]
+        for result in asyncio.run(run(url, args.paths or DEFAULT_PATHS, args.concurrency, args.duration)):
+            results.append({
+                "case": f"GET {result['path']}",
+                "samples": result["requests"],
+                "p50_ms": result["p50_ms"],
+                "p95_ms": result["p95_ms"],
+                "throughput_per_s": result["requests_per_s"],
+                "errors": result["errors"]
+            })
+        peak = server_peak_rss_mb(process.pid)
+        for result in results:
+            result["peak_rss_mb"] = peak
+    finally:
+        process.terminate()
+        process.wait()
+
+    print_table(results)
+    if args.compare:
+        compare(args.compare, results)
+    if args.output:
+        write_results(args.output, "api", results, reports=args.reports, batch_size=args.batch_size,
+                      concurrency=args.concurrency, duration=args.duration,
+                      database=database_url.split(":", 1)[0])
+
+
+if __name__ == "__main__":
+    main()
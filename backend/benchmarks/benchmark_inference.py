@@ -0,0 +1,168 @@
+# benchmark_inference.py
+"""Latency/accuracy tradeoff of the CPU inference backends
+
+Transcribes a fixed set of 16 kHz WAV files under each Whisper precision,
+then classifies the transcripts under each classifier backend/precision.
+A WAV file may have a reference transcript next to it (same name, .txt),
+which is used for WER; otherwise the first configuration is the baseline.
+The result cache is bypassed so every call runs the model.
+
+    python benchmarks/benchmark_inference.py --audio-dir recordings/ \\
+        --whisper int8,fp32 --classifier torch:fp32,torch:int8,onnx:int8 --threads 4
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+import soundfile as sf
+
+from common import use_scratch_paths, NullCache
+
+use_scratch_paths()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import model_registry
+from medical_analyzer import MedicalAnalyzerSystem
+
+
+def word_error_rate(reference, hypothesis):
+    """Word-level Levenshtein distance divided by the reference length"""
+    ref = reference.lower().split()
+    hyp = hypothesis.lower().split()
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hyp, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            ))
+        previous = current
+    return previous[-1] / max(len(ref), 1)
+
+
+def load_corpus(audio_dir):
+    """(name, samples, reference or None) for every WAV file in a directory"""
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(audio_dir, "*.wav"))):
+        audio, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+        if sample_rate != 16000:
+            raise ValueError(f"{path}: expected 16 kHz audio, got {sample_rate} Hz")
+        reference_path = os.path.splitext(path)[0] + ".txt"
+        reference = None
+        if os.path.exists(reference_path):
+            with open(reference_path, encoding="utf-8") as f:
+                reference = f.read().strip()
+        corpus.append((os.path.basename(path), audio.mean(axis=1), reference))
+    return corpus
+
+
+def benchmark_whisper(corpus, model_name, precisions):
+    results = []
+    baseline = None
+    for precision in precisions:
+        model = model_registry.get_whisper_model(model_name, precision=precision)
+        model.transcribe(corpus[0][1][:16000])  # warm-up
+
+        latencies, errors, texts = [], [], []
+        audio_seconds = 0.0
+        for name, audio, reference in corpus:
+            start = time.perf_counter()
+            text = model.transcribe(audio)["text"].strip()
+            latencies.append(time.perf_counter() - start)
+            audio_seconds += len(audio) / 16000
+            texts.append(text)
+
+            expected = reference if reference is not None else (baseline[len(texts) - 1] if baseline else None)
+            if expected is not None:
+                errors.append(word_error_rate(expected, text))
+
+        if baseline is None:
+            baseline = texts
+        results.append({
+            "stage": "whisper",
+            "config": precision,
+            "mean_latency_s": sum(latencies) / len(latencies),
+            "real_time_factor": sum(latencies) / audio_seconds,
+            "wer": sum(errors) / len(errors) if errors else None
+        })
+    return results, baseline
+
+
+def benchmark_classifier(texts, configs):
+    results = []
+    baseline = None
+    for config in configs:
+        backend, _, precision = config.partition(":")
+        analyzer = MedicalAnalyzerSystem(classifier_backend=backend, classifier_precision=precision or "fp32")
+        analyzer.cache = NullCache()
+        analyzer.analyze_with_zero_shot(texts[0])  # warm-up
+
+        latencies, labels = [], []
+        for text in texts:
+            start = time.perf_counter()
+            analysis = analyzer.analyze_with_zero_shot(text)
+            latencies.append(time.perf_counter() - start)
+            labels.append({category: result["classification"] for category, result in analysis.items()})
+
+        if baseline is None:
+            baseline = labels
+        matches = sum(
+            label[category] == expected[category]
+            for label, expected in zip(labels, baseline)
+            for category in label
+        )
+        results.append({
+            "stage": "classifier",
+            "config": config,
+            "mean_latency_s": sum(latencies) / len(latencies),
+            "label_agreement": matches / sum(len(label) for label in labels)
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CPU inference backends")
+    parser.add_argument("--audio-dir", required=True, help="directory of 16 kHz WAV files (+ optional .txt references)")
+    parser.add_argument("--whisper-model", default="base")
+    parser.add_argument("--whisper", default="fp32,int8", help="comma-separated Whisper precisions")
+    parser.add_argument("--classifier", default="torch:fp32,torch:int8",
+                        help="comma-separated backend:precision classifier configs")
+    parser.add_argument("--threads", type=int, help="CPU threads used for inference")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    if args.threads:
+        model_registry.set_inference_threads(args.threads)
+
+    corpus = load_corpus(args.audio_dir)
+    if not corpus:
+        parser.error(f"no WAV files in {args.audio_dir}")
+
+    results, transcripts = benchmark_whisper(corpus, args.whisper_model, args.whisper.split(","))
+    texts = [reference or transcript for (_, _, reference), transcript in zip(corpus, transcripts)]
+    results += benchmark_classifier(texts, args.classifier.split(","))
+
+    print(f"\n{'stage':<12}{'config':<14}{'latency (s)':>12}{'RTF':>8}{'WER':>8}{'agree':>8}")
+    for result in results:
+        rtf = result.get("real_time_factor")
+        wer = result.get("wer")
+        agreement = result.get("label_agreement")
+        print(
+            f"{result['stage']:<12}{result['config']:<14}{result['mean_latency_s']:>12.3f}"
+            f"{rtf if rtf is not None else float('nan'):>8.2f}"
+            f"{wer if wer is not None else float('nan'):>8.3f}"
+            f"{agreement if agreement is not None else float('nan'):>8.3f}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"threads": args.threads, "files": len(corpus), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
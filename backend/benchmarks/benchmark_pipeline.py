@@ -0,0 +1,123 @@
+# benchmark_pipeline.py
+"""Headless benchmark of the transcription-to-report pipeline
+
+Feeds a fixed corpus through each stage without a microphone or network:
+WAV files (if --audio-dir is given) through Whisper, and a seeded set of
+synthetic transcripts through extract_medical_entities,
+analyze_with_zero_shot / analyze_many and advanced_medical_analysis /
+batch_medical_analysis. The result cache is bypassed so every run does
+the full work.
+
+    python benchmarks/benchmark_pipeline.py --transcripts 200 --output pipeline.json
+    python benchmarks/benchmark_pipeline.py --audio-dir recordings/ --compare pipeline.json
+"""
+import argparse
+import contextlib
+import os
+import sys
+import time
+
+from common import (use_scratch_paths, NullCache, synthetic_transcripts, summarize, print_table,
+                    write_results, compare)
+
+use_scratch_paths()
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import instrumentation
+import model_registry
+from medical_analyzer import MedicalAnalyzerSystem
+from raspberry_pi_processor import AudioProcessor
+from benchmark_inference import load_corpus
+
+def peak_rss_mb():
+    peak = instrumentation.peak_rss_bytes()
+    return peak / 1024 / 1024 if peak is not None else None
+
+
+def quiet():
+    """Silence the processors' console reports while measuring"""
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def run_each(name, function, inputs, repeat=1):
+    """Latency of function over every input, after one warm-up call"""
+    latencies = []
+    tokens = 0
+    with quiet():
+        function(inputs[0])
+        for _ in range(repeat):
+            for item in inputs:
+                with instrumentation.stage(name) as timing:
+                    start = time.perf_counter()
+                    function(item)
+                    latencies.append(time.perf_counter() - start)
+                tokens += timing.tokens
+    elapsed = sum(latencies)
+    return summarize(
+        name, latencies,
+        peak_rss_mb=peak_rss_mb(),
+        tokens_per_s=tokens / elapsed if tokens and elapsed else None
+    )
+
+
+def run_batch(name, function, inputs, repeat=1):
+    """Throughput of one call over all inputs; latency is per item"""
+    latencies = []
+    with quiet():
+        function(inputs[:2])
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function(inputs)
+            latencies.append((time.perf_counter() - start) / len(inputs))
+    return summarize(name, latencies, items=len(inputs) * repeat, elapsed=sum(latencies) * len(inputs),
+                     peak_rss_mb=peak_rss_mb(), batch_size=len(inputs))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transcription-to-report pipeline")
+    parser.add_argument("--audio-dir", help="directory of 16 kHz WAV files for the transcription stage")
+    parser.add_argument("--transcripts", type=int, default=100, help="number of synthetic transcripts")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--skip-classifier", action="store_true", help="skip the zero-shot classifier stages")
+    parser.add_argument("--threads", type=int, help="CPU threads used for inference")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier --output file to compare against")
+    args = parser.parse_args()
+
+    if args.threads:
+        model_registry.set_inference_threads(args.threads)
+
+    texts = synthetic_transcripts(args.transcripts)
+    analyzer = MedicalAnalyzerSystem()
+    analyzer.cache = NullCache()
+    processor = AudioProcessor()
+    processor.cache = NullCache()
+
+    results = []
+    if args.audio_dir:
+        corpus = load_corpus(args.audio_dir)
+        if not corpus:
+            parser.error(f"no WAV files in {args.audio_dir}")
+        audio = [samples for _, samples, _ in corpus]
+        seconds = sum(len(samples) for samples in audio) / 16000
+        result = run_each("transcribe", analyzer.transcribe_audio, audio, args.repeat)
+        result["real_time_factor"] = (result["p50_ms"] / 1000) / (seconds / len(audio))
+        results.append(result)
+
+    results.append(run_each("extract_medical_entities", analyzer.extract_medical_entities, texts, args.repeat))
+    if not args.skip_classifier:
+        results.append(run_each("analyze_with_zero_shot", analyzer.analyze_with_zero_shot, texts, args.repeat))
+        results.append(run_batch("analyze_many", analyzer.analyze_many, texts, args.repeat))
+    results.append(run_each("advanced_medical_analysis", processor.advanced_medical_analysis, texts, args.repeat))
+    results.append(run_batch("batch_medical_analysis", processor.batch_medical_analysis, texts, args.repeat))
+
+    print_table(results)
+    if args.compare:
+        compare(args.compare, results)
+    if args.output:
+        write_results(args.output, "pipeline", results, transcripts=args.transcripts, repeat=args.repeat,
+                      threads=args.threads, audio_dir=args.audio_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# benchmark_serialization.py
+"""Response serialization cost for a page of reports
+
+Compares, on synthetic rows shaped like the reports table:
+
+  stdlib     response_model validation + jsonable_encoder + json.dumps
+             (FastAPI's default JSONResponse path)
+  validated  response_model validation + orjson (ORJSONResponse, VALIDATE_RESPONSES=1)
+  direct     orjson straight from the rows (VALIDATE_RESPONSES=0)
+
+    python benchmarks/benchmark_serialization.py --rows 10000 --repeat 5
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from fastapi_backend import ReportPage
+
+SYMPTOMS = ["headache", "fever", "cough", "chest pain", "nausea", "fatigue", "dizziness"]
+MEDICATIONS = ["ibuprofen", "paracetamol", "amoxicillin", "metformin"]
+
+
+def make_rows(count):
+    """Rows as get_reports builds them from the database"""
+    start = datetime(2024, 1, 1)
+    rows = []
+    for report_id in range(count, 0, -1):
+        symptoms = random.sample(SYMPTOMS, 3)
+        rows.append({
+            "id": report_id,
+            "timestamp": start + timedelta(minutes=report_id),
+            "transcript": " ".join(random.choices(SYMPTOMS + MEDICATIONS + ["patient", "reports", "since"], k=120)),
+            "medical_entities": {
+                "conditions": [],
+                "medications": random.sample(MEDICATIONS, 2),
+                "symptoms": symptoms,
+                "procedures": []
+            },
+            "analysis": {
+                "symptoms": {"classification": symptoms[0], "confidence": random.random()},
+                "severity": {"classification": "moderate", "confidence": random.random()},
+                "urgency": {"classification": "non-urgent", "confidence": random.random()}
+            }
+        })
+    return rows
+
+
+def stdlib(payload):
+    validated = ReportPage.model_validate(payload).model_dump(exclude_unset=True)
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def validated(payload):
+    return orjson.dumps(ReportPage.model_validate(payload).model_dump(exclude_unset=True))
+
+
+def direct(payload):
+    return orjson.dumps(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark report response serialization")
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON to this file")
+    args = parser.parse_args()
+
+    payload = {"items": make_rows(args.rows), "next_cursor": None}
+    results = []
+    for name, serialize in (("stdlib", stdlib), ("validated", validated), ("direct", direct)):
+        serialize(payload)  # warm-up
+        timings = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            body = serialize(payload)
+            timings.append(time.perf_counter() - start)
+        best = min(timings)
+        results.append({
+            "path": name,
+            "best_s": best,
+            "rows_per_s": args.rows / best,
+            "bytes": len(body)
+        })
+
+    baseline = results[0]["best_s"]
+    print(f"\n{'path':<12}{'best (ms)':>12}{'rows/s':>14}{'speedup':>10}")
+    for result in results:
+        result["speedup"] = baseline / result["best_s"]
+        print(f"{result['path']:<12}{result['best_s'] * 1000:>12.1f}{result['rows_per_s']:>14.0f}{result['speedup']:>9.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"rows": args.rows, "repeat": args.repeat, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
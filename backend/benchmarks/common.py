@@ -0,0 +1,168 @@
+# common.py
+"""Shared pieces of the benchmark suite
+
+Fixed synthetic inputs, latency summaries and JSON result files that can
+be compared across commits.
+"""
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+SEED = 1234
+
+SYMPTOMS = ["headache", "fever", "cough", "chest pain", "nausea", "fatigue", "dizziness", "swelling", "numbness"]
+CONDITIONS = ["diabetes", "hypertension", "asthma", "migraine", "arthritis", "infection"]
+MEDICATIONS = ["ibuprofen", "paracetamol", "aspirin", "antibiotic", "metformin"]
+PROCEDURES = ["x-ray", "scan", "blood test", "examination", "surgery"]
+SEVERITY = ["mild", "moderate", "severe", "intense", "slight"]
+FILLER = [
+    "The patient says it started {days} days ago and has been getting worse at night.",
+    "No recent travel, sleeps poorly, and appetite is reduced.",
+    "We discussed the options and agreed to review in two weeks.",
+    "Family history is unremarkable apart from the mother's condition.",
+    "They were worried because a colleague had something similar last month."
+]
+
+
+def use_scratch_paths():
+    """Keep the processors' outboxes and caches away from real data
+
+    Call before importing the backend modules, which read the paths at import.
+    """
+    scratch = tempfile.mkdtemp(prefix="healthcloud-bench-")
+    os.environ.setdefault("OUTBOX_PATH", os.path.join(scratch, "outbox.sqlite3"))
+    os.environ.setdefault("RESULT_CACHE_PATH", os.path.join(scratch, "results.sqlite3"))
+
+
+class NullCache:
+    """Result cache stand-in that never hits"""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+
+def synthetic_transcript(rng, sentences=12):
+    """A consultation-like transcript drawn from the vocabularies the extractors know"""
+    parts = []
+    for _ in range(sentences):
+        choice = rng.random()
+        if choice < 0.3:
+            parts.append(f"I have had {rng.choice(SEVERITY)} {rng.choice(SYMPTOMS)} and some {rng.choice(SYMPTOMS)}.")
+        elif choice < 0.45:
+            parts.append(f"I was diagnosed with {rng.choice(CONDITIONS)} and have a history of {rng.choice(CONDITIONS)}.")
+        elif choice < 0.6:
+            parts.append(f"I am taking {rng.choice(MEDICATIONS)} as my prescription medication.")
+        elif choice < 0.7:
+            parts.append(f"Let's arrange a {rng.choice(PROCEDURES)} to check.")
+        else:
+            parts.append(rng.choice(FILLER).format(days=rng.randint(1, 30)))
+    return " ".join(parts)
+
+
+def synthetic_transcripts(count, seed=SEED, sentences=12):
+    rng = random.Random(seed)
+    return [synthetic_transcript(rng, sentences) for _ in range(count)]
+
+
+def synthetic_reports(count, seed=SEED):
+    """Reports in the shape POST /api/reports/ accepts"""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    reports = []
+    for i in range(count):
+        symptoms = rng.sample(SYMPTOMS, 3)
+        reports.append({
+            "timestamp": (start + timedelta(minutes=37 * i)).isoformat(),
+            "transcript": synthetic_transcript(rng),
+            "medical_entities": {
+                "conditions": rng.sample(CONDITIONS, 1),
+                "medications": rng.sample(MEDICATIONS, 2),
+                "symptoms": symptoms,
+                "procedures": []
+            },
+            "analysis": {
+                "symptoms": {"classification": symptoms[0], "confidence": round(rng.random(), 3)},
+                "severity": {"classification": rng.choice(["mild", "moderate", "severe"]), "confidence": round(rng.random(), 3)},
+                "urgency": {"classification": rng.choice(["emergency", "urgent", "non-urgent", "routine"]), "confidence": round(rng.random(), 3)}
+            }
+        })
+    return reports
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(name, latencies, items=None, elapsed=None, **extra):
+    """p50/p95 latency (ms) and throughput for one benchmark case"""
+    elapsed = elapsed if elapsed is not None else sum(latencies)
+    items = items if items is not None else len(latencies)
+    return {
+        "case": name,
+        "samples": len(latencies),
+        "p50_ms": percentile(latencies, 0.50) * 1000 if latencies else None,
+        "p95_ms": percentile(latencies, 0.95) * 1000 if latencies else None,
+        "throughput_per_s": items / elapsed if elapsed else None,
+        **extra
+    }
+
+
+def environment():
+    """Where and on what the numbers were measured"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now().isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count()
+    }
+
+
+def print_table(results):
+    print(f"\n{'case':<36}{'samples':>8}{'p50 ms':>10}{'p95 ms':>10}{'per s':>10}{'peak MB':>9}")
+    for result in results:
+        def fmt(value, spec):
+            return format(value, spec) if value is not None else "-"
+        print(
+            f"{result['case']:<36}{result['samples']:>8}{fmt(result['p50_ms'], '>10.1f')}"
+            f"{fmt(result['p95_ms'], '>10.1f')}{fmt(result['throughput_per_s'], '>10.1f')}"
+            f"{fmt(result.get('peak_rss_mb'), '>9.0f')}"
+        )
+
+
+def write_results(path, suite, results, **config):
+    with open(path, "w") as f:
+        json.dump({"suite": suite, "environment": environment(), "config": config, "results": results}, f, indent=2)
+    print(f"\nWrote {path}")
+
+
+def compare(path, results):
+    """Print throughput of this run relative to an earlier results file"""
+    with open(path) as f:
+        before = {result["case"]: result for result in json.load(f)["results"]}
+    print(f"\n{'case':<36}{'p50 before':>12}{'p50 now':>10}{'throughput':>12}")
+    for result in results:
+        old = before.get(result["case"])
+        if old is None or not old.get("throughput_per_s") or not result.get("throughput_per_s"):
+            continue
+        print(
+            f"{result['case']:<36}{old['p50_ms'] or 0:>12.1f}{result['p50_ms'] or 0:>10.1f}"
+            f"{result['throughput_per_s'] / old['throughput_per_s']:>11.2f}x"
+        )
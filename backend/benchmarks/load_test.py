@@ -0,0 +1,105 @@
+# load_test.py
+"""HTTP load test for the report API
+
+Keeps --concurrency requests in flight against each path for --duration
+seconds over pooled keep-alive connections and reports requests/sec and
+latency percentiles. Save a run, change the deployment (worker class,
+worker count, pool sizes), then compare:
+
+    python benchmarks/load_test.py --url http://localhost:10000 --output before.json
+    python benchmarks/load_test.py --url http://localhost:10000 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PATHS = ["/test", "/api/reports/?limit=50", "/api/reports/stats"]
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_path(client, path, concurrency, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                response = await client.get(path)
+                if response.status_code >= 400:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+    return {
+        "path": path,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_s": len(latencies) / elapsed,
+        "mean_ms": statistics.fmean(latencies) * 1000 if latencies else float("nan"),
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000
+    }
+
+
+async def run(url, paths, concurrency, duration):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        await client.get(paths[0])  # warm-up
+        return [await run_path(client, path, concurrency, duration) for path in paths]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the report API")
+    parser.add_argument("--url", default="http://localhost:10000")
+    parser.add_argument("--path", action="append", dest="paths", help="path to request (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15, help="seconds per path")
+    parser.add_argument("--output", help="write results as JSON to this file")
+    parser.add_argument("--compare", help="earlier --output file to compare requests/sec against")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args.url, args.paths or DEFAULT_PATHS, args.concurrency, args.duration))
+
+    before = {}
+    if args.compare:
+        with open(args.compare) as f:
+            before = {result["path"]: result for result in json.load(f)["results"]}
+
+    print(f"\n{'path':<32}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'errors':>8}{'vs before':>11}")
+    for result in results:
+        change = ""
+        if result["path"] in before and before[result["path"]]["requests_per_s"]:
+            change = f"{result['requests_per_s'] / before[result['path']]['requests_per_s']:.2f}x"
+        print(
+            f"{result['path']:<32}{result['requests_per_s']:>10.0f}{result['p50_ms']:>10.1f}"
+            f"{result['p95_ms']:>10.1f}{result['p99_ms']:>10.1f}{result['errors']:>8}{change:>11}"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"url": args.url, "concurrency": args.concurrency, "duration": args.duration,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
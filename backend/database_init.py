@@ -1,9 +1,10 @@
 # database_init.py
-import sqlalchemy
 from sqlalchemy import create_engine
 import os
 from dotenv import load_dotenv
 
+from migrations import migrate
+
 # Load environment variables
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
@@ -11,27 +12,13 @@ DATABASE_URL = os.getenv("DATABASE_URL")
 # Create engine
 engine = create_engine(DATABASE_URL)
 
-# Define metadata
-metadata = sqlalchemy.MetaData()
-
-# Define table
-reports = sqlalchemy.Table(
-    "reports",
-    metadata,
-    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
-    sqlalchemy.Column("timestamp", sqlalchemy.DateTime),
-    sqlalchemy.Column("transcript", sqlalchemy.Text),
-    sqlalchemy.Column("medical_entities", sqlalchemy.JSON),
-    sqlalchemy.Column("analysis", sqlalchemy.JSON)
-)
-
 def init_db():
-    """Initialize the database"""
+    """Initialize the database by applying any pending migrations"""
     try:
-        metadata.create_all(engine)
-        print("Database tables created successfully!")
+        applied = migrate(engine)
+        print(f"Applied {len(applied)} migration(s)" if applied else "Database schema is up to date")
     except Exception as e:
-        print(f"Error creating tables: {e}")
+        print(f"Error migrating database: {e}")
 
 if __name__ == "__main__":
-    init_db()
\ No newline at end of file
+    init_db()
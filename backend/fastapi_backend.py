@@ -1,13 +1,34 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Query, UploadFile, File, Form, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
 from typing import List, Dict, Optional
-from datetime import datetime
+from collections import Counter
+from datetime import date, datetime, timedelta
+import asyncio
+import base64
+import csv
+import io
+import orjson
 import databases
 import sqlalchemy
-from sqlalchemy import JSON, create_engine
+from sqlalchemy import JSON
+from sqlalchemy.dialects import postgresql, sqlite
 import logging
 import os
+import shutil
+import time
+import uuid
 from dotenv import load_dotenv
+from transcription_queue import TranscriptionQueue, QueueFullError
+from search_index import InvertedIndex
+from response_cache import ResponseCache, CachedBody
+from schema import (reports, report_entities, report_labels, report_daily_stats, report_transcripts_cold,
+                    report_idempotency_keys, URGENCY_LABEL, SEARCH_VECTOR)
+from report_archive import decompress_transcript
+from report_facets import entity_rows, label_rows, parse_facet, stat_keys
+from report_models import MedicalEntities, Analysis, Report, ReportSubmission
+import instrumentation
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -16,47 +37,459 @@ logger = logging.getLogger(__name__)
 # Database configuration
 load_dotenv()
 DATABASE_URL = os.getenv("DATABASE_URL")
-database = databases.Database(DATABASE_URL)
-metadata = sqlalchemy.MetaData()
-
-# Define database model with combined report and analysis
-reports = sqlalchemy.Table(
-    "reports",
-    metadata,
-    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
-    sqlalchemy.Column("timestamp", sqlalchemy.DateTime),
-    sqlalchemy.Column("transcript", sqlalchemy.Text),
-    sqlalchemy.Column("medical_entities", sqlalchemy.JSON),
-    sqlalchemy.Column("analysis", sqlalchemy.JSON)
+
+def pool_options(url: str) -> Dict:
+    """asyncpg pool settings from the environment; SQLite connections take none"""
+    if databases.DatabaseURL(url).dialect != "postgresql":
+        return {}
+    return {
+        "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+        "timeout": float(os.getenv("DB_CONNECT_TIMEOUT", "10")),
+        "command_timeout": float(os.getenv("DB_COMMAND_TIMEOUT", "30")),
+        "max_inactive_connection_lifetime": float(os.getenv("DB_POOL_MAX_IDLE", "300"))
+    }
+
+HTTP_REQUEST_SECONDS = instrumentation.Histogram(
+    "http_request_duration_seconds", "API request latency", ["method", "route", "status"]
+)
+DB_QUERY_SECONDS = instrumentation.Histogram(
+    "db_query_duration_seconds", "Database query latency", ["operation"]
+)
+
+class InstrumentedDatabase(databases.Database):
+    """Database that records query latency per operation
+
+    iterate() is left untimed: its duration is set by the consumer.
+    """
+
+    async def fetch_all(self, query, values=None):
+        with DB_QUERY_SECONDS.time(operation="fetch_all"):
+            return await super().fetch_all(query, values)
+
+    async def fetch_one(self, query, values=None):
+        with DB_QUERY_SECONDS.time(operation="fetch_one"):
+            return await super().fetch_one(query, values)
+
+    async def fetch_val(self, query, values=None, column=0):
+        with DB_QUERY_SECONDS.time(operation="fetch_val"):
+            return await super().fetch_val(query, values, column)
+
+    async def execute(self, query, values=None):
+        with DB_QUERY_SECONDS.time(operation="execute"):
+            return await super().execute(query, values)
+
+    async def execute_many(self, query, values):
+        with DB_QUERY_SECONDS.time(operation="execute_many"):
+            return await super().execute_many(query, values)
+
+# Each worker opens its own pool, so workers * DB_POOL_MAX_SIZE must stay
+# below the server's max_connections. The schema lives in schema.py and is
+# applied by migrations.py, never by the workers.
+database = InstrumentedDatabase(DATABASE_URL, **pool_options(DATABASE_URL))
+
+# Transcription job queue configuration
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+# Job state is shared through a SQLite file, so any API worker can answer a
+# status poll; only one of them runs the TRANSCRIPTION_WORKERS Whisper processes
+transcription_queue = TranscriptionQueue(
+    os.getenv("TRANSCRIPTION_JOB_STORE", os.path.join(UPLOAD_DIR, "transcription_jobs.sqlite3")),
+    model_name=os.getenv("WHISPER_MODEL", "base"),
+    workers=int(os.getenv("TRANSCRIPTION_WORKERS", "2")),
+    max_pending=int(os.getenv("TRANSCRIPTION_QUEUE_SIZE", "32")),
+    start_method=os.getenv("TRANSCRIPTION_START_METHOD", "spawn")
+)
+
+# Postgres searches the generated search_vector column (migration 2)
+NATIVE_SEARCH = database.url.dialect == "postgresql"
+
+# Fallback index for SQLite, built on first search and brought up to date
+# from the database before every search, so reports inserted through other
+# workers are found too
+search_index = InvertedIndex()
+search_index_lock = asyncio.Lock()
+
+# Ids re-checked behind the newest indexed report, for inserts that commit
+# out of id order
+SEARCH_REFRESH_OVERLAP = 1000
+
+REPORT_FIELDS = ("id", "timestamp", "transcript", "medical_entities", "analysis")
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+STATS_BUCKETS = ("day", "week", "month")
+DEFAULT_TOP_TERMS = 10
+DEFAULT_SEARCH_RESULTS = 20
+MAX_SEARCH_RESULTS = 100
+
+# Export streams rows from a server-side cursor, flushing every EXPORT_CHUNK_ROWS
+EXPORT_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+EXPORT_CHUNK_ROWS = 500
+
+# Rows read back from our own table are trusted; set VALIDATE_RESPONSES=0 to
+# serialize them straight to JSON instead of re-validating every field
+VALIDATE_RESPONSES = os.getenv("VALIDATE_RESPONSES", "1") != "0"
+
+# Serialized bodies for conditional GETs. Reports never change once written;
+# list pages are dropped on insert and expire after LIST_CACHE_TTL seconds,
+# which bounds staleness on workers that did not handle the insert
+report_cache = ResponseCache(max_entries=int(os.getenv("REPORT_CACHE_SIZE", "4096")))
+list_cache = ResponseCache(
+    max_entries=int(os.getenv("LIST_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("LIST_CACHE_TTL", "5"))
 )
 
-# Create tables
-engine = create_engine(DATABASE_URL)
-try:
-    metadata.create_all(engine)
-    logger.info("Database tables created successfully")
-except Exception as e:
-    logger.error(f"Error creating tables: {e}")
-
-# Pydantic models
-class MedicalEntities(BaseModel):
-    conditions: List[str]
-    medications: List[str]
-    symptoms: List[str]
-    procedures: List[str]
-
-class Analysis(BaseModel):
-    symptoms: Dict
-    severity: Dict
-    urgency: Dict
-
-class Report(BaseModel):
+# Bulk ingestion limits; inserts are chunked to stay under driver parameter limits
+MAX_BULK_REPORTS = int(os.getenv("MAX_BULK_REPORTS", "1000"))
+MAX_BULK_BYTES = int(os.getenv("MAX_BULK_BYTES", str(32 * 1024 * 1024)))
+BULK_INSERT_CHUNK = 500
+
+# Pydantic models; the ingest payload (Report) lives in report_models.py
+class ReportSummary(BaseModel):
+    id: int
     timestamp: datetime
-    transcript: str
-    medical_entities: MedicalEntities
-    analysis: Analysis
+    transcript: Optional[str] = None
+    medical_entities: Optional[MedicalEntities] = None
+    analysis: Optional[Analysis] = None
+
+class ReportPage(BaseModel):
+    items: List[ReportSummary]
+    next_cursor: Optional[str] = None
+
+class SearchHit(ReportSummary):
+    score: float
+
+class SearchResults(BaseModel):
+    query: str
+    items: List[SearchHit]
+
+class TermCount(BaseModel):
+    term: str
+    count: int
+
+class VolumeBucket(BaseModel):
+    start: date
+    count: int
+
+class ReportStats(BaseModel):
+    bucket: str
+    total: int
+    by_urgency: Dict[str, int]
+    by_severity: Dict[str, int]
+    top_symptoms: List[TermCount]
+    volume: List[VolumeBucket]
+
+class BulkItemResult(BaseModel):
+    index: int
+    status: str
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class BulkResult(BaseModel):
+    created: int
+    failed: int
+    results: List[BulkItemResult]
+
+class TranscriptionJob(BaseModel):
+    id: str
+    status: str
+    created_at: datetime
+    completed_at: Optional[datetime] = None
+    transcript: Optional[str] = None
+    error: Optional[str] = None
+
+def encode_cursor(timestamp: datetime, report_id: int) -> str:
+    """Encode the position after a report as an opaque cursor"""
+    raw = f"{timestamp.isoformat()}|{report_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor: str):
+    """Decode a cursor into its (timestamp, id) position"""
+    try:
+        timestamp, report_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(report_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def row_response(payload):
+    """Return a payload for response_model validation, or serialized as-is when trusted"""
+    if VALIDATE_RESPONSES:
+        return payload
+    return ORJSONResponse(payload)
+
+def cache_key(request: Request) -> str:
+    return f"{request.url.path}?{request.url.query}"
+
+def cached_response(request: Request, entry: CachedBody) -> Response:
+    """Serve a cached body, or 304 if the client already holds it"""
+    if entry.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=entry.headers)
+    return Response(entry.body, media_type="application/json", headers=entry.headers)
+
+def store_response(request: Request, cache: ResponseCache, generation: int, payload, model, **dump_options) -> Response:
+    """Validate (unless trusted), serialize and cache a payload, then serve it"""
+    if VALIDATE_RESPONSES:
+        payload = model.model_validate(payload).model_dump(**dump_options)
+    entry = cache.set(cache_key(request), orjson.dumps(payload), generation)
+    return cached_response(request, entry)
+
+def parse_fields(fields: Optional[str]) -> List[str]:
+    """Resolve a comma-separated projection, always keeping the cursor columns"""
+    if not fields:
+        return list(REPORT_FIELDS)
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - set(REPORT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return [field for field in REPORT_FIELDS if field in requested or field in ("id", "timestamp")]
+
+def report_values(report: Report) -> Dict:
+    return {
+        "timestamp": report.timestamp,
+        "transcript": report.transcript,
+        "medical_entities": report.medical_entities.dict(),
+        "analysis": report.analysis.dict()
+    }
+
+async def insert_rows(table: sqlalchemy.Table, rows: List[Dict]):
+    for start in range(0, len(rows), BULK_INSERT_CHUNK):
+        await database.execute(table.insert().values(rows[start:start + BULK_INSERT_CHUNK]))
+
+async def known_idempotency_keys(keys: List[str]) -> Dict[str, int]:
+    """Report ids already stored under any of these keys"""
+    known = {}
+    for start in range(0, len(keys), BULK_INSERT_CHUNK):
+        query = sqlalchemy.select(report_idempotency_keys.c.idempotency_key, report_idempotency_keys.c.report_id)
+        query = query.where(report_idempotency_keys.c.idempotency_key.in_(keys[start:start + BULK_INSERT_CHUNK]))
+        known.update((row[0], row[1]) for row in await database.fetch_all(query))
+    return known
+
+async def insert_reports(items: List[Report]) -> List[int]:
+    """Insert reports with multi-row INSERT ... RETURNING inside one transaction
+
+    The entity and label side tables are written in the same transaction.
+    A report whose idempotency key is already stored, or repeated earlier in
+    the batch, is not inserted again; the original report's id is returned.
+    """
+    async with database.transaction():
+        # A concurrent insert of the same new key fails this transaction on the
+        # key's primary key, and the client's retry then finds it here
+        keys = [getattr(report, "idempotency_key", None) for report in items]
+        known = await known_idempotency_keys(sorted({key for key in keys if key is not None}))
+        first = {}
+        new = []
+        for index, key in enumerate(keys):
+            if key is not None:
+                if key in known or key in first:
+                    continue
+                first[key] = index
+            new.append(index)
+        inserted = [items[index] for index in new]
+
+        new_ids = []
+        for start in range(0, len(inserted), BULK_INSERT_CHUNK):
+            chunk = inserted[start:start + BULK_INSERT_CHUNK]
+            query = reports.insert().values([report_values(report) for report in chunk]).returning(reports.c.id)
+            rows = await database.fetch_all(query)
+            # RETURNING order is unspecified, but ids are assigned in VALUES order
+            new_ids.extend(sorted(row[0] for row in rows))
+        ids_by_index = dict(zip(new, new_ids))
+        now = datetime.utcnow()
+        await insert_rows(report_idempotency_keys, [
+            {"idempotency_key": key, "report_id": ids_by_index[index], "created_at": now}
+            for key, index in first.items()
+        ])
+
+        entities, labels = [], []
+        for report_id, report in zip(new_ids, inserted):
+            entities.extend(entity_rows(report_id, report.timestamp, report.medical_entities.dict()))
+            labels.extend(label_rows(report_id, report.timestamp, report.analysis.dict()))
+        await insert_rows(report_entities, entities)
+        await insert_rows(report_labels, labels)
+        await update_daily_stats(inserted)
+
+    if inserted:
+        # After commit, so no list page built from pre-insert rows survives
+        list_cache.clear()
+
+    ids = []
+    for index, key in enumerate(keys):
+        if index in ids_by_index:
+            ids.append(ids_by_index[index])
+        elif key in known:
+            ids.append(known[key])
+        else:
+            ids.append(ids_by_index[first[key]])
+    return ids
+
+async def update_daily_stats(items: List[Report]):
+    """Add a batch of reports to the rollup with one upsert per chunk"""
+    counts = Counter()
+    for report in items:
+        counts.update(stat_keys(report.timestamp, report.medical_entities.dict(), report.analysis.dict()))
+    # In key order, so concurrent upserts take row locks in the same order
+    # and cannot deadlock
+    rows = [{"day": day, "dimension": dimension, "value": value, "count": count}
+            for (day, dimension, value), count in sorted(counts.items())]
+
+    dialect_insert = postgresql.insert if database.url.dialect == "postgresql" else sqlite.insert
+    for start in range(0, len(rows), BULK_INSERT_CHUNK):
+        query = dialect_insert(report_daily_stats).values(rows[start:start + BULK_INSERT_CHUNK])
+        query = query.on_conflict_do_update(
+            index_elements=["day", "dimension", "value"],
+            set_={"count": report_daily_stats.c.count + query.excluded.count}
+        )
+        await database.execute(query)
+
+def bucket_start(day: date, bucket: str) -> date:
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    if bucket == "month":
+        return day.replace(day=1)
+    return day
+
+def with_cold_transcripts(query, columns: List[str]):
+    """Select the archived transcript alongside reports columns, when transcripts are requested
+
+    Every endpoint returns archived transcripts decompressed; row_values
+    fills them in.
+    """
+    if "transcript" not in columns:
+        return query.add_columns(sqlalchemy.null().label("transcript_zstd"))
+    return query.add_columns(report_transcripts_cold.c.transcript_zstd).select_from(
+        reports.outerjoin(report_transcripts_cold, report_transcripts_cold.c.report_id == reports.c.id)
+    )
+
+def row_values(row, columns: List[str]) -> Dict:
+    """Column values of a report row, with archived transcripts decompressed"""
+    values = {column: row[column] for column in columns}
+    if "transcript" in values and values["transcript"] is None and row["transcript_zstd"] is not None:
+        values["transcript"] = decompress_transcript(row["transcript_zstd"])
+    return values
 
-app = FastAPI()
+async def export_ndjson(query, columns: List[str]):
+    chunk = []
+    async for row in database.iterate(query):
+        chunk.append(orjson.dumps(row_values(row, columns)))
+        if len(chunk) == EXPORT_CHUNK_ROWS:
+            yield b"\n".join(chunk) + b"\n"
+            chunk = []
+    if chunk:
+        yield b"\n".join(chunk) + b"\n"
+
+async def export_csv(query, columns: List[str]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    rows = 0
+    async for row in database.iterate(query):
+        values = []
+        for value in row_values(row, columns).values():
+            if isinstance(value, (dict, list)):
+                value = orjson.dumps(value).decode()
+            elif isinstance(value, datetime):
+                value = value.isoformat()
+            values.append(value)
+        writer.writerow(values)
+        rows += 1
+        if rows % EXPORT_CHUNK_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+async def refresh_search_index():
+    """Index reports committed since the last refresh, by any worker
+
+    Only this reads reports into the index, so the watermark (the newest
+    indexed id) never runs ahead of what was read from the database. Ids
+    just behind it are checked again for rows that committed late.
+    """
+    async with search_index_lock:
+        since = max(0, search_index.max_id - SEARCH_REFRESH_OVERLAP)
+        recent = await database.fetch_all(sqlalchemy.select(reports.c.id).where(reports.c.id > since))
+        missing = [row["id"] for row in recent if row["id"] not in search_index]
+        if not missing:
+            return
+        columns = ["id", "transcript", "medical_entities"]
+        query = (
+            with_cold_transcripts(sqlalchemy.select(*[reports.c[column] for column in columns]), columns)
+            .where(reports.c.id > since)
+            .order_by(reports.c.id)
+        )
+        if len(missing) <= BULK_INSERT_CHUNK:
+            # A handful of new reports; the first build reads the whole range
+            query = query.where(reports.c.id.in_(missing))
+        added = 0
+        async for row in database.iterate(query):
+            if row["id"] in search_index:
+                continue
+            values = row_values(row, columns)
+            search_index.add(values["id"], values["transcript"], values["medical_entities"])
+            added += 1
+        if added:
+            logger.info(f"Search index: added {added} reports ({len(search_index)} total)")
+
+async def stream_bulk_body(request: Request):
+    """Yield the request body in chunks, refusing it past MAX_BULK_BYTES"""
+    too_large = HTTPException(status_code=413, detail=f"Bulk bodies are limited to {MAX_BULK_BYTES} bytes")
+    # Reject early when the client declares the size
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > MAX_BULK_BYTES:
+        raise too_large
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > MAX_BULK_BYTES:
+            raise too_large
+        yield chunk
+
+async def read_bulk_payload(request: Request) -> List:
+    """Split a bulk body into raw items: a JSON array, or NDJSON streamed line by line"""
+    content_type = request.headers.get("content-type", "")
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        lines = []
+        pending = b""
+        async for chunk in stream_bulk_body(request):
+            pending += chunk
+            *complete, pending = pending.split(b"\n")
+            lines.extend(line for line in complete if line.strip())
+            if len(lines) > MAX_BULK_REPORTS:
+                raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_REPORTS} reports per request")
+        if pending.strip():
+            lines.append(pending)
+        return lines
+
+    body = bytearray()
+    async for chunk in stream_bulk_body(request):
+        body += chunk
+    try:
+        payload = orjson.loads(body)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    if not isinstance(payload, list):
+        raise HTTPException(status_code=400, detail="Expected a JSON array of reports")
+    return payload
+
+app = FastAPI(default_response_class=ORJSONResponse)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # Label by route template, not raw path, to bound cardinality
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status
+        )
 
 @app.on_event("startup")
 async def startup():
@@ -67,40 +500,280 @@ async def startup():
         logger.error(f"Error connecting to database: {e}")
         raise
 
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    transcription_queue.start()
+    # Runs in each worker after the fork, so every worker publishes its own snapshot
+    instrumentation.REGISTRY.start_snapshots()
+
 @app.on_event("shutdown")
 async def shutdown():
+    await run_in_threadpool(transcription_queue.stop)
+    instrumentation.REGISTRY.write_snapshot()
     try:
         await database.disconnect()
         logger.info("Database disconnected successfully")
     except Exception as e:
         logger.error(f"Error disconnecting from database: {e}")
 
-@app.get("/api/reports/", response_model=List[Report])
-async def get_reports():
+@app.get("/api/reports/", response_model=ReportPage, response_model_exclude_unset=True)
+async def get_reports(
+    request: Request,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    urgency: Optional[str] = None,
+    entity: Optional[List[str]] = Query(None),
+    label: Optional[List[str]] = Query(None),
+    fields: Optional[str] = None
+):
+    entry = list_cache.get(cache_key(request))
+    if entry is not None:
+        return cached_response(request, entry)
+    generation = list_cache.generation
+
     try:
-        query = reports.select()
-        result = await database.fetch_all(query)
-        logger.info(f"Retrieved {len(result) if result else 0} reports")
-        return result
+        columns = parse_fields(fields)
+        query = with_cold_transcripts(sqlalchemy.select(*[reports.c[column] for column in columns]), columns)
+
+        # Filters
+        if start is not None:
+            query = query.where(reports.c.timestamp >= start)
+        if end is not None:
+            query = query.where(reports.c.timestamp < end)
+        if urgency is not None:
+            query = query.where(URGENCY_LABEL == urgency)
+
+        # Entity filters: "term" in any category, or "category:term"; all must match
+        for value in entity or []:
+            category, term = parse_facet(value)
+            matching = sqlalchemy.select(report_entities.c.report_id).where(report_entities.c.term == term)
+            if category is not None:
+                matching = matching.where(report_entities.c.category == category)
+            query = query.where(reports.c.id.in_(matching))
+
+        # Label filters: "category:label", e.g. severity:severe
+        for value in label or []:
+            category, value_label = parse_facet(value)
+            if category is None:
+                raise HTTPException(status_code=400, detail=f"Label filter must be category:label, got {value!r}")
+            query = query.where(reports.c.id.in_(
+                sqlalchemy.select(report_labels.c.report_id).where(
+                    report_labels.c.category == category,
+                    report_labels.c.label == value_label
+                )
+            ))
+
+        # Keyset pagination on (timestamp, id), newest first
+        if cursor is not None:
+            cursor_timestamp, cursor_id = decode_cursor(cursor)
+            query = query.where(sqlalchemy.or_(
+                reports.c.timestamp < cursor_timestamp,
+                sqlalchemy.and_(reports.c.timestamp == cursor_timestamp, reports.c.id < cursor_id)
+            ))
+        query = query.order_by(reports.c.timestamp.desc(), reports.c.id.desc()).limit(limit + 1)
+
+        rows = await database.fetch_all(query)
+        items = [row_values(row, columns) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = items[-1]
+            next_cursor = encode_cursor(last["timestamp"], last["id"])
+
+        logger.info(f"Retrieved {len(items)} reports")
+        payload = {"items": items, "next_cursor": next_cursor}
+        return store_response(request, list_cache, generation, payload, ReportPage, exclude_unset=True)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving reports: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/api/reports/", response_model=Report)
-async def create_report(report: Report):
+@app.get("/api/reports/stats", response_model=ReportStats)
+async def get_report_stats(
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    bucket: str = Query("day"),
+    top: int = Query(DEFAULT_TOP_TERMS, ge=1, le=100)
+):
+    if bucket not in STATS_BUCKETS:
+        raise HTTPException(status_code=400, detail=f"bucket must be one of {', '.join(STATS_BUCKETS)}")
     try:
-        query = reports.insert().values(
-            timestamp=report.timestamp,
-            transcript=report.transcript,
-            medical_entities=report.medical_entities.dict(),
-            analysis=report.analysis.dict()
+        query = sqlalchemy.select(report_daily_stats).where(
+            report_daily_stats.c.dimension.in_(["reports", "label:urgency", "label:severity", "entity:symptoms"])
         )
-        last_record_id = await database.execute(query)
+        if start is not None:
+            query = query.where(report_daily_stats.c.day >= start)
+        if end is not None:
+            query = query.where(report_daily_stats.c.day < end)
+
+        volume, urgency, severity, symptoms = Counter(), Counter(), Counter(), Counter()
+        for row in await database.fetch_all(query):
+            if row["dimension"] == "reports":
+                volume[bucket_start(row["day"], bucket)] += row["count"]
+            elif row["dimension"] == "label:urgency":
+                urgency[row["value"]] += row["count"]
+            elif row["dimension"] == "label:severity":
+                severity[row["value"]] += row["count"]
+            else:
+                symptoms[row["value"]] += row["count"]
+
+        return {
+            "bucket": bucket,
+            "total": sum(volume.values()),
+            "by_urgency": dict(urgency),
+            "by_severity": dict(severity),
+            "top_symptoms": [{"term": term, "count": count} for term, count in symptoms.most_common(top)],
+            "volume": [{"start": day, "count": volume[day]} for day in sorted(volume)]
+        }
+    except Exception as e:
+        logger.error(f"Error computing report stats: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/reports/export")
+async def export_reports(
+    format: str = Query("ndjson"),
+    since: Optional[int] = Query(None, ge=0),
+    fields: Optional[str] = None
+):
+    """Stream every report with id > since, oldest first
+
+    Ids are assigned in insert order, so the largest id of one export is
+    the watermark for the next; a timestamp watermark would miss reports
+    that edge devices upload late.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    columns = parse_fields(fields)
+    query = with_cold_transcripts(sqlalchemy.select(*[reports.c[column] for column in columns]), columns)
+    query = query.order_by(reports.c.id)
+    if since is not None:
+        query = query.where(reports.c.id > since)
+
+    logger.info(f"Exporting reports as {format} since id {since or 0}")
+    rows = export_csv(query, columns) if format == "csv" else export_ndjson(query, columns)
+    return StreamingResponse(
+        rows,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="reports.{format}"'}
+    )
+
+@app.get("/api/reports/search", response_model=SearchResults, response_model_exclude_unset=True)
+async def search_reports(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(DEFAULT_SEARCH_RESULTS, ge=1, le=MAX_SEARCH_RESULTS),
+    fields: Optional[str] = None
+):
+    try:
+        columns = parse_fields(fields)
+        if NATIVE_SEARCH:
+            # Ranked lookup through the GIN index on search_vector
+            ts_query = sqlalchemy.func.websearch_to_tsquery("english", q)
+            rank = sqlalchemy.func.ts_rank(SEARCH_VECTOR, ts_query)
+            query = (
+                with_cold_transcripts(
+                    sqlalchemy.select(*[reports.c[column] for column in columns], rank.label("score")), columns
+                )
+                .where(SEARCH_VECTOR.op("@@")(ts_query))
+                .order_by(rank.desc(), reports.c.id.desc())
+                .limit(limit)
+            )
+            rows = await database.fetch_all(query)
+            items = [{**row_values(row, columns), "score": row["score"]} for row in rows]
+        else:
+            await refresh_search_index()
+            hits = search_index.search(q, limit)
+            query = with_cold_transcripts(sqlalchemy.select(*[reports.c[column] for column in columns]), columns).where(
+                reports.c.id.in_([report_id for report_id, _ in hits])
+            )
+            rows = {row["id"]: row for row in await database.fetch_all(query)} if hits else {}
+            items = [
+                {**row_values(rows[report_id], columns), "score": score}
+                for report_id, score in hits if report_id in rows
+            ]
+
+        logger.info(f"Search for {q!r} matched {len(items)} reports")
+        return row_response({"query": q, "items": items})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching reports: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/reports/", response_model=Report)
+async def create_report(report: ReportSubmission):
+    try:
+        [last_record_id] = await insert_reports([report])
         return {**report.dict(), "id": last_record_id}
     except Exception as e:
         logger.error(f"Error creating report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/reports/bulk", response_model=BulkResult, response_model_exclude_none=True)
+async def create_reports_bulk(request: Request):
+    raw_items = await read_bulk_payload(request)
+    if len(raw_items) > MAX_BULK_REPORTS:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_REPORTS} reports per request")
+
+    # Validate everything first; only valid items are inserted
+    results = []
+    valid = []
+    for index, raw in enumerate(raw_items):
+        try:
+            if isinstance(raw, bytes):
+                report = ReportSubmission.model_validate_json(raw)
+            else:
+                report = ReportSubmission.model_validate(raw)
+            valid.append((index, report))
+            results.append({"index": index, "status": "created"})
+        except ValidationError as e:
+            results.append({"index": index, "status": "invalid", "error": str(e)})
+
+    try:
+        ids = await insert_reports([report for _, report in valid])
+    except Exception as e:
+        logger.error(f"Error creating reports in bulk: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    for (index, _), report_id in zip(valid, ids):
+        results[index]["id"] = report_id
+    logger.info(f"Bulk created {len(ids)} reports, rejected {len(raw_items) - len(ids)}")
+    return {"created": len(ids), "failed": len(raw_items) - len(ids), "results": results}
+
+@app.post("/api/recording/upload/", response_model=TranscriptionJob, status_code=202)
+async def upload_recording(file: UploadFile = File(...), duration: Optional[float] = Form(None)):
+    audio_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4().hex}.wav")
+    try:
+        # Stream the upload to disk without blocking the event loop
+        with open(audio_path, "wb") as out:
+            await run_in_threadpool(shutil.copyfileobj, file.file, out, UPLOAD_CHUNK_SIZE)
+        # The job store is SQLite and may wait on its lock; keep it off the event loop
+        job_id = await run_in_threadpool(transcription_queue.submit, audio_path)
+        logger.info(f"Queued transcription job {job_id} ({duration or 'unknown'}s)")
+        return await run_in_threadpool(transcription_queue.get, job_id)
+    except QueueFullError as e:
+        os.remove(audio_path)
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error uploading recording: {e}")
+        if os.path.exists(audio_path):
+            os.remove(audio_path)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        await file.close()
+
+@app.get("/api/recording/jobs/{job_id}", response_model=TranscriptionJob)
+async def get_transcription_job(job_id: str):
+    job = await run_in_threadpool(transcription_queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics, summed over all workers when METRICS_DIR is set"""
+    return Response(instrumentation.REGISTRY.render(), media_type=instrumentation.CONTENT_TYPE)
+
 @app.get("/test")
 async def test_endpoint():
     return {"status": "API is running"}
@@ -115,7 +788,11 @@ async def test_database():
         return {"status": "Database connection failed", "error": str(e)}
 
 @app.get("/api/reports/{report_id}", response_model=Report)
-async def get_report(report_id: int):
+async def get_report(report_id: int, request: Request):
+    entry = report_cache.get(cache_key(request))
+    if entry is not None:
+        return cached_response(request, entry)
+
     try:
         query = reports.select().where(reports.c.id == report_id)
         result = await database.fetch_one(query)
@@ -123,16 +800,31 @@ async def get_report(report_id: int):
         if result is None:
             raise HTTPException(status_code=404, detail="Report not found")
         
+        # Archived transcripts are fetched and decompressed on demand
+        transcript = result.transcript
+        if transcript is None:
+            cold = await database.fetch_one(
+                sqlalchemy.select(report_transcripts_cold.c.transcript_zstd)
+                .where(report_transcripts_cold.c.report_id == report_id)
+            )
+            if cold is None:
+                # Archived, but the archived copy is gone
+                logger.error(f"Report {report_id} has no transcript and no archived transcript")
+                raise HTTPException(status_code=410, detail="Report transcript is no longer available")
+            transcript = decompress_transcript(cold.transcript_zstd)
+
         # Format and return the report
         report = {
             "id": result.id,
             "timestamp": result.timestamp,
-            "transcript": result.transcript,
+            "transcript": transcript,
             "medical_entities": result.medical_entities,
             "analysis": result.analysis
         }
         logger.info(f"Retrieved report {report_id}")
-        return report
+        return store_response(request, report_cache, report_cache.generation, report, Report)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error retrieving report: {e}")
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,2 +1,31 @@
-bind = "0.0.0.0:10000"
-workers = 2
\ No newline at end of file
+import multiprocessing
+import os
+
+import instrumentation
+import model_registry
+
+bind = os.getenv("BIND", "0.0.0.0:10000")
+
+# The app is async, so one worker per core keeps every core busy; the
+# sync-worker 2 * cores + 1 rule would only add memory and DB pools
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.getenv("WEB_CONCURRENCY", str(multiprocessing.cpu_count())))
+
+# Import the app once in the master so workers fork from it
+preload_app = True
+
+# Reuse client connections; keep this above any proxy's idle timeout
+keepalive = int(os.getenv("KEEPALIVE", "75"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = 30
+
+def on_starting(server):
+    # Models listed in PRELOAD_MODELS (e.g. "whisper:base") are loaded before
+    # workers fork, so every worker shares the read-only weights copy-on-write
+    model_registry.preload_from_env()
+    # Metrics snapshots from a previous run would inflate the new totals
+    instrumentation.REGISTRY.clear_snapshots()
+
+def child_exit(server, worker):
+    # An exited worker's counters still count; its gauges no longer describe anything
+    instrumentation.REGISTRY.mark_process_dead(worker.pid)
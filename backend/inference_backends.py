@@ -0,0 +1,126 @@
+# inference_backends.py
+import os
+import torch
+from torch import nn
+
+BACKENDS = ("torch", "onnx")
+PRECISIONS = ("fp32", "fp16", "int8")
+
+ONNX_CACHE_DIR = os.getenv(
+    "ONNX_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "healthcloud", "onnx")
+)
+
+
+def set_num_threads(threads):
+    """Cap the intra-op threads PyTorch uses for CPU inference"""
+    if threads:
+        torch.set_num_threads(int(threads))
+
+
+def quantize_int8(model):
+    """Dynamically quantize every nn.Linear to int8 weights (CPU only)"""
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+
+
+def quantize_whisper_int8(model):
+    """int8 dynamic quantization for Whisper
+
+    Whisper wraps its projections in a Linear subclass, which the dynamic
+    quantizer does not recognise, so they are swapped for plain nn.Linear
+    modules sharing the same parameters first.
+    """
+    from whisper.model import Linear as WhisperLinear
+
+    for module in list(model.modules()):
+        for child_name, child in module.named_children():
+            if type(child) is WhisperLinear:
+                plain = nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                plain.weight = child.weight
+                plain.bias = child.bias
+                setattr(module, child_name, plain)
+    return quantize_int8(model)
+
+
+class OnnxSequenceClassifier(nn.Module):
+    """ONNX Runtime stand-in for a transformers sequence classification model
+
+    Exposes config, device and a forward returning .logits so the
+    zero-shot pipeline and the batched NLI path can use it unchanged.
+    """
+
+    def __init__(self, session, config):
+        super().__init__()
+        self.session = session
+        self.config = config
+        self.input_names = [model_input.name for model_input in session.get_inputs()]
+
+    @property
+    def device(self):
+        return torch.device("cpu")
+
+    def forward(self, input_ids, attention_mask=None, **kwargs):
+        from transformers.modeling_outputs import SequenceClassifierOutput
+
+        feeds = {"input_ids": input_ids.cpu().numpy()}
+        if "attention_mask" in self.input_names:
+            feeds["attention_mask"] = attention_mask.cpu().numpy()
+        logits = self.session.run(["logits"], feeds)[0]
+        return SequenceClassifierOutput(logits=torch.from_numpy(logits))
+
+
+def _export_onnx(model, tokenizer, path):
+    """Export a sequence classification model with dynamic batch and length axes"""
+    model.eval()
+    model.config.use_cache = False
+    sample = tokenizer(["premise"], ["hypothesis"], return_tensors="pt")
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            path,
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={
+                "input_ids": {0: "batch", 1: "sequence"},
+                "attention_mask": {0: "batch", 1: "sequence"},
+                "logits": {0: "batch"}
+            },
+            opset_version=17
+        )
+
+
+def to_onnx(classifier, precision="fp32", threads=None):
+    """Swap a zero-shot pipeline's model for an ONNX Runtime session
+
+    The exported graph is cached under ONNX_CACHE_DIR; precision "int8"
+    additionally applies ONNX Runtime dynamic quantization.
+    """
+    try:
+        import onnxruntime
+    except ImportError:
+        print("ONNX backend requires onnxruntime. Please install with:")
+        print("pip install onnxruntime")
+        raise
+
+    name = classifier.model.config._name_or_path
+    cache_dir = os.path.join(ONNX_CACHE_DIR, name.replace("/", "__"))
+    os.makedirs(cache_dir, exist_ok=True)
+    fp32_path = os.path.join(cache_dir, "model.onnx")
+    if not os.path.exists(fp32_path):
+        _export_onnx(classifier.model, classifier.tokenizer, fp32_path)
+
+    path = fp32_path
+    if precision == "int8":
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        path = os.path.join(cache_dir, "model.int8.onnx")
+        if not os.path.exists(path):
+            quantize_dynamic(fp32_path, path, weight_type=QuantType.QInt8)
+
+    options = onnxruntime.SessionOptions()
+    if threads:
+        options.intra_op_num_threads = int(threads)
+    session = onnxruntime.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+    classifier.model = OnnxSequenceClassifier(session, classifier.model.config)
+    return classifier
@@ -0,0 +1,409 @@
+# instrumentation.py
+"""Stage timers and Prometheus-format metrics without extra dependencies
+
+Pipelines wrap each step in stage() inside a job(); every stage records
+wall time, CPU time, how far it raised the process's peak RSS and (via
+add_tokens) model tokens per second. A finished job is printed as one JSON
+line. REGISTRY.render() returns all metrics in the Prometheus text format
+for a /metrics endpoint; CLIs can expose it with serve_metrics(port).
+
+Metrics live in each process. Under gunicorn a scrape reaches one worker
+at random, so set METRICS_DIR to a directory shared by the workers: each
+one then snapshots its metrics there every METRICS_SNAPSHOT_INTERVAL
+seconds and render() sums counters and histograms over all of them.
+Gauges are per process and keep a pid label.
+"""
+import contextvars
+import copy
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+METRICS_DIR = os.getenv("METRICS_DIR")
+SNAPSHOT_INTERVAL = float(os.getenv("METRICS_SNAPSHOT_INTERVAL", "5"))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def snapshot(self):
+        with self._lock:
+            return copy.deepcopy(self._values)
+
+    @staticmethod
+    def combine(a, b):
+        """Merge the values of one series from two processes"""
+        return a + b
+
+    def render(self, values=None, labelnames=None):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        values = self.snapshot() if values is None else values
+        for key, value in sorted(values.items()):
+            lines.extend(self._render_sample(labelnames or self.labelnames, key, value))
+        return lines
+
+    def _render_sample(self, labelnames, key, value):
+        return [f"{self.name}{_format_labels(labelnames, key)} {value}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += 1
+            state[2] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    @staticmethod
+    def combine(a, b):
+        return [[x + y for x, y in zip(a[0], b[0])], a[1] + b[1], a[2] + b[2]]
+
+    def _render_sample(self, labelnames, key, state):
+        counts, count, total = state
+        lines = [
+            f"{self.name}_bucket{_format_labels(labelnames, key, [('le', bound)])} {bucket_count}"
+            for bound, bucket_count in zip(self.buckets, counts)
+        ]
+        lines.append(f"{self.name}_bucket{_format_labels(labelnames, key, [('le', '+Inf')])} {count}")
+        lines.append(f"{self.name}_count{_format_labels(labelnames, key)} {count}")
+        lines.append(f"{self.name}_sum{_format_labels(labelnames, key)} {total}")
+        return lines
+
+
+class Registry:
+    def __init__(self, directory=METRICS_DIR):
+        self._metrics = []
+        self.directory = directory
+        self._snapshot_thread = None
+
+    def register(self, metric):
+        self._metrics.append(metric)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format, summed over METRICS_DIR if set"""
+        rss = peak_rss_bytes()
+        if rss is not None:
+            PEAK_RSS.set(rss)
+        lines = []
+        if not self.directory:
+            for metric in self._metrics:
+                lines.extend(metric.render())
+            return "\n".join(lines) + "\n"
+
+        self.write_snapshot()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                with open(path) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue  # removed or replaced while listing
+        for metric in self._metrics:
+            merged = {}
+            for snapshot in snapshots:
+                for key, value in snapshot["metrics"].get(metric.name, []):
+                    if metric.kind == "gauge":
+                        merged[(*key, snapshot["pid"])] = value
+                    else:
+                        key = tuple(key)
+                        merged[key] = metric.combine(merged[key], value) if key in merged else value
+            labelnames = metric.labelnames + ("pid",) if metric.kind == "gauge" else None
+            lines.extend(metric.render(merged, labelnames))
+        return "\n".join(lines) + "\n"
+
+    def _snapshot_path(self, pid):
+        return os.path.join(self.directory, f"metrics-{pid}.json")
+
+    def write_snapshot(self):
+        """Publish this process's metrics to METRICS_DIR for the other workers' scrapes"""
+        if not self.directory:
+            return
+        pid = os.getpid()
+        snapshot = {
+            "pid": pid,
+            "metrics": {
+                metric.name: [[list(key), value] for key, value in metric.snapshot().items()]
+                for metric in self._metrics
+            }
+        }
+        path = self._snapshot_path(pid)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+
+    def start_snapshots(self):
+        """Snapshot this process's metrics every SNAPSHOT_INTERVAL seconds; call once per worker after fork"""
+        if not self.directory or self._snapshot_thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+
+        def run():
+            while True:
+                try:
+                    self.write_snapshot()
+                except OSError as e:
+                    print(f"Metrics: could not write snapshot: {e!r}")
+                time.sleep(SNAPSHOT_INTERVAL)
+
+        self._snapshot_thread = threading.Thread(target=run, daemon=True)
+        self._snapshot_thread.start()
+
+    def mark_process_dead(self, pid):
+        """Drop an exited worker's gauges; its counters stay in the totals"""
+        if not self.directory:
+            return
+        path = self._snapshot_path(pid)
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        for metric in self._metrics:
+            if metric.kind == "gauge":
+                snapshot["metrics"].pop(metric.name, None)
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+
+    def clear_snapshots(self):
+        """Remove snapshots left by an earlier server run"""
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json*")):
+            os.remove(path)
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Wall time per pipeline stage", ["stage"])
+STAGE_CPU_SECONDS = Counter("pipeline_stage_cpu_seconds_total", "Process CPU time spent per pipeline stage", ["stage"])
+STAGE_TOKENS = Counter("pipeline_stage_tokens_total", "Model tokens processed per pipeline stage", ["stage"])
+JOB_SECONDS = Histogram("pipeline_job_seconds", "Wall time per pipeline job", ["job"])
+JOBS = Counter("pipeline_jobs_total", "Pipeline jobs by outcome", ["job", "status"])
+PEAK_RSS = Gauge("process_peak_rss_bytes", "Peak resident set size of this process")
+
+
+def peak_rss_bytes():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def whisper_token_count(result):
+    """Decoded tokens in a Whisper transcribe() result"""
+    return sum(len(segment.get("tokens", [])) for segment in result.get("segments", []))
+
+
+class Stage:
+    """Measurements of one pipeline step"""
+
+    def __init__(self, name):
+        self.name = name
+        self.tokens = 0
+        self.wall_s = None
+        self.cpu_s = None
+        # How far the stage raised the process's peak RSS; 0 if an earlier
+        # stage had already reached it
+        self.peak_rss_growth_bytes = None
+
+    @property
+    def tokens_per_s(self):
+        if not self.tokens or not self.wall_s:
+            return None
+        return self.tokens / self.wall_s
+
+    def as_dict(self):
+        return {
+            "wall_s": round(self.wall_s, 4),
+            "cpu_s": round(self.cpu_s, 4),
+            "peak_rss_growth_mb": (round(self.peak_rss_growth_bytes / 1024 / 1024, 1)
+                                   if self.peak_rss_growth_bytes is not None else None),
+            "tokens": self.tokens or None,
+            "tokens_per_s": round(self.tokens_per_s, 1) if self.tokens_per_s else None
+        }
+
+
+class Job:
+    """Stages of one end-to-end pipeline run"""
+
+    def __init__(self, name, fields):
+        self.name = name
+        self.id = uuid.uuid4().hex
+        self.fields = fields
+        self.stages = []
+        self.status = "ok"
+        self.started = datetime.now()
+        self.wall_s = None
+
+    def as_dict(self):
+        return {
+            "event": "job",
+            "job": self.name,
+            "id": self.id,
+            "started": self.started.isoformat(),
+            "status": self.status,
+            "wall_s": round(self.wall_s, 4),
+            "process_peak_rss_mb": round(peak_rss_bytes() / 1024 / 1024, 1) if resource is not None else None,
+            "stages": {stage.name: stage.as_dict() for stage in self.stages},
+            **self.fields
+        }
+
+
+_current_stage = contextvars.ContextVar("instrumentation_stage", default=None)
+_current_job = contextvars.ContextVar("instrumentation_job", default=None)
+
+
+def record_stage(stage):
+    """Add a finished stage to the metrics, e.g. one measured in another process"""
+    STAGE_SECONDS.observe(stage.wall_s, stage=stage.name)
+    STAGE_CPU_SECONDS.inc(stage.cpu_s, stage=stage.name)
+    if stage.tokens:
+        STAGE_TOKENS.inc(stage.tokens, stage=stage.name)
+
+
+@contextmanager
+def stage(name):
+    """Measure a pipeline step; nested inside job() it is also part of the job's log line"""
+    record = Stage(name)
+    token = _current_stage.set(record)
+    rss = peak_rss_bytes()
+    wall = time.perf_counter()
+    cpu = time.process_time()
+    try:
+        yield record
+    finally:
+        record.wall_s = time.perf_counter() - wall
+        record.cpu_s = time.process_time() - cpu
+        if rss is not None:
+            record.peak_rss_growth_bytes = peak_rss_bytes() - rss
+        _current_stage.reset(token)
+        record_stage(record)
+        current_job = _current_job.get()
+        if current_job is not None:
+            current_job.stages.append(record)
+
+
+def add_tokens(count):
+    """Credit model tokens to the innermost running stage"""
+    current = _current_stage.get()
+    if current is not None:
+        current.tokens += count
+
+
+@contextmanager
+def job(name, log=print, **fields):
+    """Group stages into one job and emit it as a single JSON log line"""
+    record = Job(name, fields)
+    token = _current_job.set(record)
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record.status = "error"
+        raise
+    finally:
+        record.wall_s = time.perf_counter() - start
+        _current_job.reset(token)
+        JOB_SECONDS.observe(record.wall_s, job=name)
+        JOBS.inc(job=name, status=record.status)
+        log(json.dumps(record.as_dict()))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port, host="0.0.0.0"):
+    """Serve /metrics from a background thread (for the CLI processors)"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving metrics on http://{host}:{port}/metrics")
+    return server
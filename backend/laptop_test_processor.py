@@ -1,19 +1,40 @@
 # laptop_test_processor.py
 import sounddevice as sd
 import numpy as np
-import requests
 import json
 from datetime import datetime
 import soundfile as sf
-import tempfile
-import whisper
+import os
+import argparse
+from term_matcher import TermMatcher
+from streaming_transcriber import StreamingTranscriber
+import model_registry
+from report_outbox import ReportOutbox
+from report_models import report_payload, symptom_summary
+import result_cache
+import instrumentation
 
 class TestAudioProcessor:
+    # Basic medical terms to look for
+    keywords = {
+        "conditions": ["migraine", "diabetes", "hypertension", "asthma"],
+        "medications": ["ibuprofen", "aspirin", "paracetamol", "medication"],
+        "symptoms": ["headache", "pain", "nausea", "fever", "cough"],
+        "procedures": ["surgery", "test", "scan", "x-ray"]
+    }
+
     def __init__(self):
         self.api_url = "http://localhost:8000/api/reports"
-        print("Loading Whisper model...")
-        self.model = whisper.load_model("base")
+        # The sender starts on the first report queued
+        self.outbox = ReportOutbox(self.api_url)
+        self.term_matcher = TermMatcher(self.keywords)
+        self.cache = result_cache.get_cache()
         print("Test system ready!")
+
+    @property
+    def model(self):
+        # Loaded from the shared registry on first use
+        return model_registry.get_whisper_model("base")
         
     def record_audio(self):
         """Record audio from microphone until stopped"""
@@ -44,113 +65,130 @@ class TestAudioProcessor:
         return None
 
     def save_audio(self, audio):
-        """Save audio to temporary file"""
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
-            sf.write(temp_audio.name, audio, 16000)
-            return temp_audio.name
+        """Archive the recording as a WAV file when AUDIO_ARCHIVE_DIR is set"""
+        archive_dir = os.getenv("AUDIO_ARCHIVE_DIR")
+        if not archive_dir:
+            return None
+        os.makedirs(archive_dir, exist_ok=True)
+        audio_path = os.path.join(archive_dir, f"consultation_{datetime.now():%Y%m%d_%H%M%S}.wav")
+        sf.write(audio_path, audio, 16000)
+        return audio_path
 
-    def transcribe_audio(self, audio_path):
-        """Transcribe audio using Whisper"""
+    def transcribe_audio(self, audio):
+        """Transcribe a 16 kHz audio buffer (or file path) using Whisper"""
         print("Transcribing audio...")
-        result = self.model.transcribe(audio_path)
+        if not isinstance(audio, str):
+            # Whisper takes the 16 kHz float32 samples directly, skipping ffmpeg
+            audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        
+        # Identical recordings are only decoded once
+        text = result_cache.cached_transcribe(self.model, audio, cache=self.cache)
+        
+        print("\nTRANSCRIPTION:")
+        print("-"*50)
+        print(text)
+        print("-"*50 + "\n")
+        
+        return text
+
+    def stream_transcription(self):
+        """Record and transcribe concurrently in ~30 s windows"""
+        transcript = StreamingTranscriber(self.model).record()
         
         print("\nTRANSCRIPTION:")
         print("-"*50)
-        print(result["text"])
+        print(transcript)
         print("-"*50 + "\n")
         
-        return result["text"]
+        return transcript
 
     def simulate_medical_info(self, transcript):
         """Simulate medical entity extraction based on actual transcript"""
         # Simple keyword-based extraction for testing
-        medical_entities = {
-            "conditions": [],
-            "medications": [],
-            "symptoms": [],
-            "procedures": []
-        }
-        
-        # Basic medical terms to look for
-        keywords = {
-            "conditions": ["migraine", "diabetes", "hypertension", "asthma"],
-            "medications": ["ibuprofen", "aspirin", "paracetamol", "medication"],
-            "symptoms": ["headache", "pain", "nausea", "fever", "cough"],
-            "procedures": ["surgery", "test", "scan", "x-ray"]
-        }
-        
-        # Look for keywords in transcript
-        transcript_lower = transcript.lower()
-        for category, terms in keywords.items():
-            for term in terms:
-                if term in transcript_lower:
-                    medical_entities[category].append(term)
+        medical_entities = self.term_matcher.extract(transcript)
         
         print("Extracted Medical Entities:")
         print(json.dumps(medical_entities, indent=2))
         return medical_entities
         
     def send_to_api(self, report_data):
-        """Send test report to FastAPI backend"""
-        try:
-            print("\nSending to API...")
-            response = requests.post(
-                self.api_url,
-                json=report_data,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            print("Successfully sent to API!")
-            print("\nAPI Response:")
-            print(json.dumps(response.json(), indent=2))
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending data to API: {e}")
-            if hasattr(e, 'response'):
-                print("Error details:", e.response.text)
-            return None
+        """Queue test report for upload to the FastAPI backend"""
+        # Persisted locally first; the outbox sender delivers it in the background
+        outbox_id = self.outbox.put(report_data)
+        print(f"\nReport queued for upload (outbox #{outbox_id}, {self.outbox.pending_count()} pending)")
+        return {"outbox_id": outbox_id}
 
-    def process_test(self):
+    def process_test(self, streaming=False):
         """Test processing pipeline"""
-        try:
-            # Record audio
-            audio = self.record_audio()
-            
-            if audio is not None:
-                # Save audio
-                audio_path = self.save_audio(audio)
-                print(f"Audio saved to: {audio_path}")
-                
-                # Transcribe audio
-                transcript = self.transcribe_audio(audio_path)
+        with instrumentation.job("test", streaming=streaming) as job:
+            try:
+                if streaming:
+                    # Transcribe while recording
+                    with instrumentation.stage("record_transcribe"):
+                        transcript = self.stream_transcription()
+                else:
+                    # Record audio
+                    with instrumentation.stage("record"):
+                        audio = self.record_audio()
+                    if audio is None:
+                        return None
+                    
+                    # Optionally archive the recording
+                    with instrumentation.stage("save"):
+                        audio_path = self.save_audio(audio)
+                    if audio_path:
+                        print(f"Audio saved to: {audio_path}")
+                    
+                    # Transcribe audio
+                    with instrumentation.stage("transcribe"):
+                        transcript = self.transcribe_audio(audio)
                 
                 # Extract medical entities (simulated but based on actual transcript)
-                medical_info = self.simulate_medical_info(transcript)
+                with instrumentation.stage("extract_entities"):
+                    medical_info = self.simulate_medical_info(transcript)
                 
-                # Create report
-                report = {
-                    "timestamp": datetime.now().isoformat(),
-                    "transcript": transcript,
-                    "medical_entities": medical_info
-                }
+                # Create report; nothing is classified in the test pipeline
+                report = report_payload(datetime.now(), transcript, medical_info, {
+                    "symptoms": symptom_summary(medical_info["symptoms"]),
+                    "severity": {},
+                    "urgency": {}
+                })
                 
                 # Send to API
-                result = self.send_to_api(report)
+                with instrumentation.stage("upload"):
+                    result = self.send_to_api(report)
                 return result
-            
-        except Exception as e:
-            print(f"Error in test pipeline: {e}")
-            return None
+                
+            except Exception as e:
+                job.status = "error"
+                print(f"Error in test pipeline: {e}")
+                return None
 
 def main():
+    parser = argparse.ArgumentParser(description="Record, transcribe and send a test report")
+    parser.add_argument("--stream", action="store_true",
+                        help="transcribe in the background while recording")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this port while running")
+    args = parser.parse_args()
+    if args.metrics_port:
+        instrumentation.serve_metrics(args.metrics_port)
+
     processor = TestAudioProcessor()
+    # Deliver anything an earlier run left queued
+    processor.outbox.start()
     print("\nStarting test system...")
     print("This version will:")
     print("1. Record your voice until you press Ctrl+C")
     print("2. Transcribe the actual recording")
     print("3. Extract medical entities")
     print("4. Send everything to the API")
-    processor.process_test()
+    processor.process_test(streaming=args.stream)
+
+    # Give the sender a moment to deliver; anything left is retried on the next run
+    if not processor.outbox.flush(timeout=30):
+        print(f"{processor.outbox.pending_count()} report(s) still queued; they will be sent on the next run")
+    processor.outbox.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
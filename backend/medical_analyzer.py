@@ -2,25 +2,47 @@
 import sounddevice as sd
 import soundfile as sf
 import numpy as np
-import whisper
-from transformers import pipeline
-import spacy
-import tempfile
+import torch
+import os
 from datetime import datetime
-import requests
 import json
+import argparse
+from term_matcher import TermMatcher
+from streaming_transcriber import StreamingTranscriber
+import model_registry
+from report_outbox import ReportOutbox
+from report_models import report_payload, symptom_summary
+import result_cache
+import instrumentation
 
 class MedicalAnalyzerSystem:
-    def __init__(self):
-        print("Loading Whisper model...")
-        self.whisper_model = whisper.load_model("base")
+    # Zero-shot label sets scored for every transcript
+    analysis_categories = {
+        "urgency": ["emergency", "urgent", "non-urgent", "routine"],
+        "severity": ["mild", "moderate", "severe"],
+        "follow_up": ["immediate", "short-term", "routine"]
+    }
+    hypothesis_template = "This example is {}."
+
+    def __init__(self, batch_size=32, whisper_precision=None, classifier_backend=None,
+                 classifier_precision=None, api_url="http://localhost:8000/api/reports"):
+        # Inference configuration; None falls back to the registry defaults
+        self.whisper_precision = whisper_precision
+        self.classifier_backend = classifier_backend
+        self.classifier_precision = classifier_precision
+        self.cache = result_cache.get_cache()
         
-        print("Loading classification model...")
-        self.classifier = pipeline("zero-shot-classification", 
-                                 model="facebook/bart-large-mnli")
+        # (premise, hypothesis) pairs per forward pass
+        self.batch_size = batch_size
+
+        # Each distinct label is one NLI hypothesis, shared across categories
+        self.candidate_labels = list(dict.fromkeys(
+            label for labels in self.analysis_categories.values() for label in labels
+        ))
         
-        self.nlp = spacy.load('en_core_web_sm')
-        self.api_url = "http://localhost:8000/api/reports"
+        self.api_url = api_url
+        # The sender starts on the first report queued
+        self.outbox = ReportOutbox(self.api_url)
         
         # Medical terms for entity extraction
         self.medical_terms = {
@@ -41,9 +63,32 @@ class MedicalAnalyzerSystem:
                 "examination", "check-up"
             ]
         }
+        self.term_matcher = TermMatcher(self.medical_terms)
         
         print("System ready!")
 
+    # Models come from the shared registry and load on first use
+    @property
+    def whisper_model(self):
+        return model_registry.get_whisper_model("base", precision=self.whisper_precision)
+
+    @property
+    def classifier(self):
+        return model_registry.get_classifier(
+            "facebook/bart-large-mnli",
+            precision=self.classifier_precision,
+            backend=self.classifier_backend
+        )
+
+    @property
+    def nlp(self):
+        return model_registry.get_spacy_model("en_core_web_sm")
+
+    def _classifier_version(self):
+        precision = self.classifier_precision or model_registry.CLASSIFIER_PRECISION
+        backend = self.classifier_backend or model_registry.CLASSIFIER_BACKEND
+        return f"facebook/bart-large-mnli:{precision}:{backend}"
+
     def record_audio(self, sample_rate=16000):
         """Record audio until stopped"""
         print("\n" + "="*50)
@@ -72,21 +117,37 @@ class MedicalAnalyzerSystem:
             return audio, sample_rate
         return None, None
 
-    def transcribe_audio(self, audio_path):
-        """Transcribe audio using Whisper"""
+    def transcribe_audio(self, audio):
+        """Transcribe a 16 kHz audio buffer (or file path) using Whisper"""
         print("Transcribing audio...")
-        result = self.whisper_model.transcribe(audio_path)
+        if not isinstance(audio, str):
+            # Whisper takes the 16 kHz float32 samples directly, skipping ffmpeg
+            audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        
+        # Identical recordings are only decoded once
+        text = result_cache.cached_transcribe(self.whisper_model, audio, precision=self.whisper_precision,
+                                              cache=self.cache)
+        
+        print("\nTRANSCRIPTION:")
+        print("-"*50)
+        print(text)
+        print("-"*50 + "\n")
+        
+        return text
+
+    def stream_transcription(self):
+        """Record and transcribe concurrently in ~30 s windows"""
+        transcript = StreamingTranscriber(self.whisper_model).record()
         
         print("\nTRANSCRIPTION:")
         print("-"*50)
-        print(result["text"])
+        print(transcript)
         print("-"*50 + "\n")
         
-        return result["text"]
+        return transcript
 
     def extract_medical_entities(self, text):
         """Extract medical entities using predefined categories"""
-        text_lower = text.lower()
         entities = {
             "conditions": [],
             "medications": [],
@@ -94,83 +155,142 @@ class MedicalAnalyzerSystem:
             "procedures": []
         }
         
-        # Extract entities for each category
-        for category in self.medical_terms:
-            for term in self.medical_terms[category]:
-                if term in text_lower:
-                    entities[category].append(term)
+        # Single scan over the transcript for all categories
+        for match in self.term_matcher.find(text):
+            if match.term not in entities[match.category]:
+                entities[match.category].append(match.term)
         
         return entities
 
     def analyze_with_zero_shot(self, text):
         """Additional AI analysis using zero-shot classification"""
-        analysis_categories = {
-            "urgency": ["emergency", "urgent", "non-urgent", "routine"],
-            "severity": ["mild", "moderate", "severe"],
-            "follow_up": ["immediate", "short-term", "routine"]
-        }
+        return self.analyze_many([text])[0]
+
+    def analyze_many(self, texts):
+        """Zero-shot classify several transcripts, reusing cached results"""
+        version = f"{self._classifier_version()}:{self.hypothesis_template}:{json.dumps(self.analysis_categories)}"
+        keys = [result_cache.text_key("zero_shot", text, version) for text in texts]
+        results = [self.cache.get(key) for key in keys]
         
-        ai_analysis = {}
-        for category, labels in analysis_categories.items():
-            result = self.classifier(text, candidate_labels=labels)
-            ai_analysis[category] = {
-                "classification": result["labels"][0],
-                "confidence": result["scores"][0]
-            }
+        misses = [i for i, result in enumerate(results) if result is None]
+        for i, analysis in zip(misses, self._classify_batch([texts[i] for i in misses])):
+            self.cache.set(keys[i], analysis)
+            results[i] = analysis
+        return results
+
+    def _classify_batch(self, texts):
+        """Zero-shot classify several transcripts in batched NLI passes"""
+        if not texts:
+            return []
+
+        # One (premise, hypothesis) pair per transcript and distinct label
+        pairs = [
+            (text, self.hypothesis_template.format(label))
+            for text in texts
+            for label in self.candidate_labels
+        ]
+
+        tokenizer = self.classifier.tokenizer
+        model = self.classifier.model
+        entailment_logits = []
+        with torch.inference_mode():
+            for start in range(0, len(pairs), self.batch_size):
+                batch = pairs[start:start + self.batch_size]
+                inputs = tokenizer(
+                    [premise for premise, _ in batch],
+                    [hypothesis for _, hypothesis in batch],
+                    padding=True,
+                    truncation="only_first",
+                    return_tensors="pt"
+                ).to(model.device)
+                logits = model(**inputs).logits
+                instrumentation.add_tokens(int(inputs["attention_mask"].sum()))
+                entailment_logits.append(logits[:, self.classifier.entailment_id])
+        entailment_logits = torch.cat(entailment_logits).view(len(texts), len(self.candidate_labels))
+
+        # Softmax over each category's labels, as the single-label pipeline does
+        label_index = {label: i for i, label in enumerate(self.candidate_labels)}
+        results = []
+        for row in entailment_logits:
+            ai_analysis = {}
+            for category, labels in self.analysis_categories.items():
+                scores = row[[label_index[label] for label in labels]].softmax(dim=0)
+                best = int(scores.argmax())
+                ai_analysis[category] = {
+                    "classification": labels[best],
+                    "confidence": float(scores[best])
+                }
+            results.append(ai_analysis)
         
-        return ai_analysis
+        return results
 
     def save_audio(self, audio, sample_rate):
-        """Save audio to a temporary file"""
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
-            sf.write(temp_audio.name, audio, sample_rate)
-            return temp_audio.name
+        """Archive the recording as a WAV file when AUDIO_ARCHIVE_DIR is set"""
+        archive_dir = os.getenv("AUDIO_ARCHIVE_DIR")
+        if not archive_dir:
+            return None
+        os.makedirs(archive_dir, exist_ok=True)
+        audio_path = os.path.join(archive_dir, f"consultation_{datetime.now():%Y%m%d_%H%M%S}.wav")
+        sf.write(audio_path, audio, sample_rate)
+        return audio_path
+
+    def build_report(self, transcript, medical_entities, zero_shot, timestamp=None):
+        """The report for a transcript, validated against the API's Report model"""
+        return report_payload(
+            timestamp or datetime.now(),
+            transcript,
+            medical_entities,
+            {
+                "symptoms": symptom_summary(medical_entities["symptoms"]),
+                "severity": zero_shot["severity"],
+                "urgency": zero_shot["urgency"]
+            }
+        )
 
     def send_to_api(self, report_data):
-        """Send report data to API"""
-        try:
-            response = requests.post(
-                self.api_url,
-                json=report_data,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            print("\nSuccessfully sent to API!")
-            return response.json()
-        except Exception as e:
-            print(f"\nError sending to API: {e}")
-            if hasattr(e.response, 'text'):
-                print("Error details:", e.response.text)
-            return None
+        """Queue report data for upload to the API"""
+        # Persisted locally first; the outbox sender delivers it in the background
+        outbox_id = self.outbox.put(report_data)
+        print(f"\nReport queued for upload (outbox #{outbox_id}, {self.outbox.pending_count()} pending)")
+        return {"outbox_id": outbox_id}
 
-    def process_consultation(self):
+    def process_consultation(self, streaming=False):
         """Main processing pipeline"""
-        try:
-            # Record audio
-            audio, sample_rate = self.record_audio()
-            
-            if audio is not None:
-                # Save audio to file
-                audio_path = self.save_audio(audio, sample_rate)
-                
-                # Transcribe audio
-                transcript = self.transcribe_audio(audio_path)
+        with instrumentation.job("consultation", streaming=streaming) as job:
+            try:
+                if streaming:
+                    # Transcribe while recording
+                    with instrumentation.stage("record_transcribe"):
+                        transcript = self.stream_transcription()
+                else:
+                    # Record audio
+                    with instrumentation.stage("record"):
+                        audio, sample_rate = self.record_audio()
+                    if audio is None:
+                        return None
+                    
+                    # Optionally archive the recording
+                    with instrumentation.stage("save"):
+                        self.save_audio(audio, sample_rate)
+                    
+                    # Transcribe audio
+                    with instrumentation.stage("transcribe"):
+                        transcript = self.transcribe_audio(audio)
                 
                 # Extract medical entities
-                medical_entities = self.extract_medical_entities(transcript)
+                with instrumentation.stage("extract_entities"):
+                    medical_entities = self.extract_medical_entities(transcript)
                 
                 # Perform AI analysis
-                ai_analysis = self.analyze_with_zero_shot(transcript)
+                with instrumentation.stage("classify"):
+                    ai_analysis = self.analyze_with_zero_shot(transcript)
                 
                 # Prepare report
-                report = {
-                    "timestamp": datetime.now().isoformat(),
-                    "transcript": transcript,
-                    "medical_entities": medical_entities
-                }
+                report = self.build_report(transcript, medical_entities, ai_analysis)
                 
                 # Send to API
-                result = self.send_to_api(report)
+                with instrumentation.stage("upload"):
+                    result = self.send_to_api(report)
                 
                 # Print results
                 print("\nMedical Entities:")
@@ -179,16 +299,46 @@ class MedicalAnalyzerSystem:
                 print(json.dumps(ai_analysis, indent=2))
                 
                 return result
-            
-        except Exception as e:
-            print(f"Error in processing pipeline: {e}")
-            return None
+                
+            except Exception as e:
+                job.status = "error"
+                print(f"Error in processing pipeline: {e}")
+                return None
 
 def main():
-    analyzer = MedicalAnalyzerSystem()
+    parser = argparse.ArgumentParser(description="Record and analyze a medical consultation")
+    parser.add_argument("--stream", action="store_true",
+                        help="transcribe in the background while recording")
+    parser.add_argument("--whisper-precision", choices=["fp32", "fp16", "int8"],
+                        help="Whisper weights precision (default: $WHISPER_PRECISION or fp32)")
+    parser.add_argument("--classifier-backend", choices=["torch", "onnx"],
+                        help="zero-shot classifier runtime (default: $CLASSIFIER_BACKEND or torch)")
+    parser.add_argument("--classifier-precision", choices=["fp32", "fp16", "int8"],
+                        help="zero-shot classifier precision (default: $CLASSIFIER_PRECISION or fp32)")
+    parser.add_argument("--threads", type=int, help="CPU threads used for inference")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this port while running")
+    args = parser.parse_args()
+    if args.metrics_port:
+        instrumentation.serve_metrics(args.metrics_port)
+    if args.threads:
+        model_registry.set_inference_threads(args.threads)
+
+    analyzer = MedicalAnalyzerSystem(
+        whisper_precision=args.whisper_precision,
+        classifier_backend=args.classifier_backend,
+        classifier_precision=args.classifier_precision
+    )
+    # Deliver anything an earlier run left queued
+    analyzer.outbox.start()
     print("\nStarting medical consultation analysis...")
     print("Press Ctrl+C to stop recording when finished speaking")
-    analyzer.process_consultation()
+    analyzer.process_consultation(streaming=args.stream)
+
+    # Give the sender a moment to deliver; anything left is retried on the next run
+    if not analyzer.outbox.flush(timeout=30):
+        print(f"{analyzer.outbox.pending_count()} report(s) still queued; they will be sent on the next run")
+    analyzer.outbox.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
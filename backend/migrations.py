@@ -0,0 +1,253 @@
+# migrations.py
+"""Versioned schema migrations
+
+Each migration runs once, in its own transaction, and is recorded in
+schema_migrations. Every step is idempotent, so databases created before
+migrations existed (by the old database_init.py) are adopted as-is.
+Tables are created from schema.py: once a migration has shipped, change
+a table by adding a migration, not by editing the earlier one.
+
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # list applied and pending migrations
+"""
+import os
+from collections import Counter
+from datetime import datetime
+
+import sqlalchemy
+from sqlalchemy import create_engine
+from dotenv import load_dotenv
+
+from schema import (reports, report_entities, report_labels, report_daily_stats, report_transcripts_cold,
+                    report_idempotency_keys, schema_migrations)
+from report_facets import entity_rows, label_rows, stat_keys
+from report_archive import ensure_partitions
+
+BACKFILL_BATCH = 1000
+
+# Serializes migration runs across processes on Postgres
+MIGRATION_LOCK_KEY = 7201
+
+# Entities outrank transcript text in search ranking
+SEARCH_VECTOR_SQL = """
+    setweight(json_to_tsvector('english', coalesce(medical_entities, '{}'::json), '["string"]'), 'A') ||
+    setweight(to_tsvector('english', coalesce(transcript, '')), 'B')
+"""
+
+
+def create_table(conn, table):
+    """Create a table with its indexes, or add any indexes an existing one lacks
+
+    Indexes use CREATE INDEX IF NOT EXISTS rather than checkfirst: SQLite
+    reflection skips expression indexes, so checkfirst would recreate them.
+    """
+    if not sqlalchemy.inspect(conn).has_table(table.name):
+        table.create(conn)
+        return
+    for index in table.indexes:
+        conn.execute(sqlalchemy.schema.CreateIndex(index, if_not_exists=True))
+
+
+def create_reports(conn):
+    create_table(conn, reports)
+
+
+def add_search_vector(conn):
+    """Weighted tsvector maintained by Postgres, behind GET /api/reports/search
+
+    Other databases use the in-process index in search_index.py instead.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    conn.execute(sqlalchemy.text(
+        f"ALTER TABLE reports ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED"
+    ))
+    conn.execute(sqlalchemy.text(
+        "CREATE INDEX IF NOT EXISTS ix_reports_search_vector ON reports USING GIN (search_vector)"
+    ))
+
+
+def create_report_facets(conn):
+    """Entity and label side tables, backfilled for reports that predate them"""
+    for table in (report_entities, report_labels):
+        create_table(conn, table)
+
+    missing = sqlalchemy.select(reports.c.id, reports.c.timestamp, reports.c.medical_entities, reports.c.analysis).where(
+        ~sqlalchemy.exists().where(report_entities.c.report_id == reports.c.id),
+        ~sqlalchemy.exists().where(report_labels.c.report_id == reports.c.id)
+    ).order_by(reports.c.id)
+
+    backfilled = 0
+    last_id = 0
+    while True:
+        rows = conn.execute(missing.where(reports.c.id > last_id).limit(BACKFILL_BATCH)).fetchall()
+        if not rows:
+            break
+        entities, labels = [], []
+        for row in rows:
+            entities.extend(entity_rows(row.id, row.timestamp, row.medical_entities))
+            labels.extend(label_rows(row.id, row.timestamp, row.analysis))
+        if entities:
+            conn.execute(report_entities.insert(), entities)
+        if labels:
+            conn.execute(report_labels.insert(), labels)
+        backfilled += len(rows)
+        last_id = rows[-1].id
+    print(f"Backfilled entities and labels for {backfilled} reports")
+
+
+def create_daily_stats(conn):
+    """Daily rollup table, rebuilt from the reports table if empty"""
+    report_daily_stats.create(conn, checkfirst=True)
+    if conn.execute(sqlalchemy.select(report_daily_stats.c.day).limit(1)).first() is not None:
+        return
+
+    counts = Counter()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sqlalchemy.select(reports.c.id, reports.c.timestamp, reports.c.medical_entities, reports.c.analysis)
+            .where(reports.c.id > last_id, reports.c.timestamp.is_not(None))
+            .order_by(reports.c.id)
+            .limit(BACKFILL_BATCH)
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            counts.update(stat_keys(row.timestamp, row.medical_entities, row.analysis))
+        last_id = rows[-1].id
+
+    if counts:
+        conn.execute(report_daily_stats.insert(), [
+            {"day": day, "dimension": dimension, "value": value, "count": count}
+            for (day, dimension, value), count in counts.items()
+        ])
+    print(f"Backfilled {len(counts)} daily stats rows")
+
+
+def partition_reports(conn):
+    """Rebuild reports on Postgres as a table range-partitioned by month
+
+    Rows are copied in this migration's transaction, so run it in a
+    maintenance window on large tables. Reports without a timestamp are
+    kept in reports_default under the epoch.
+    """
+    if conn.dialect.name != "postgresql":
+        return
+    if conn.execute(sqlalchemy.text("SELECT relkind FROM pg_class WHERE relname = 'reports'")).scalar() == "p":
+        return
+
+    sequence = conn.execute(sqlalchemy.text("SELECT pg_get_serial_sequence('reports', 'id')")).scalar()
+    first = conn.execute(sqlalchemy.text('SELECT min("timestamp") FROM reports')).scalar()
+    for statement in [
+        f"ALTER SEQUENCE {sequence} OWNED BY NONE",
+        "ALTER TABLE reports RENAME TO reports_unpartitioned",
+        "ALTER TABLE reports_unpartitioned RENAME CONSTRAINT reports_pkey TO reports_unpartitioned_pkey",
+        "DROP INDEX IF EXISTS ix_reports_timestamp_id",
+        "DROP INDEX IF EXISTS ix_reports_urgency_timestamp_id",
+        "DROP INDEX IF EXISTS ix_reports_search_vector",
+        f"""
+        CREATE TABLE reports (
+            id integer NOT NULL DEFAULT nextval('{sequence}'),
+            "timestamp" timestamp without time zone NOT NULL,
+            transcript text,
+            medical_entities json,
+            analysis json,
+            search_vector tsvector GENERATED ALWAYS AS ({SEARCH_VECTOR_SQL}) STORED,
+            PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+        """,
+        "CREATE TABLE reports_default PARTITION OF reports DEFAULT"
+    ]:
+        conn.execute(sqlalchemy.text(statement))
+
+    ensure_partitions(conn, first.date() if first else None)
+    for statement in [
+        "INSERT INTO reports (id, \"timestamp\", transcript, medical_entities, analysis) "
+        "SELECT id, coalesce(\"timestamp\", 'epoch'), transcript, medical_entities, analysis FROM reports_unpartitioned",
+        "DROP TABLE reports_unpartitioned",
+        f"ALTER SEQUENCE {sequence} OWNED BY reports.id",
+        # Created on the parent, so every current and future partition gets them
+        "CREATE INDEX ix_reports_timestamp_id ON reports (\"timestamp\", id)",
+        "CREATE INDEX ix_reports_urgency_timestamp_id ON reports "
+        "((analysis -> 'urgency' ->> 'classification'), \"timestamp\", id)",
+        "CREATE INDEX ix_reports_search_vector ON reports USING GIN (search_vector)"
+    ]:
+        conn.execute(sqlalchemy.text(statement))
+
+
+def create_cold_transcripts(conn):
+    """Sidecar table for zstd-compressed transcripts archived by report_archive.py"""
+    report_transcripts_cold.create(conn, checkfirst=True)
+
+
+def create_idempotency_keys(conn):
+    """Keys clients send with reports, so a retried submission is not stored twice"""
+    create_table(conn, report_idempotency_keys)
+
+
+# (version, migration) in order; never renumber or remove entries
+MIGRATIONS = [
+    (1, create_reports),
+    (2, add_search_vector),
+    (3, create_report_facets),
+    (4, create_daily_stats),
+    (5, partition_reports),
+    (6, create_cold_transcripts),
+    (7, create_idempotency_keys)
+]
+
+
+def applied_versions(conn):
+    schema_migrations.create(conn, checkfirst=True)
+    return {row.version for row in conn.execute(sqlalchemy.select(schema_migrations.c.version))}
+
+
+def migrate(engine, target=None):
+    """Apply pending migrations up to target (default: all); returns the versions applied"""
+    applied = []
+    with engine.connect() as lock_conn:
+        if engine.dialect.name == "postgresql":
+            lock_conn.execute(sqlalchemy.text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        try:
+            with engine.begin() as conn:
+                done = applied_versions(conn)
+            for version, migration in MIGRATIONS:
+                if version in done or (target is not None and version > target):
+                    continue
+                print(f"Applying migration {version}: {migration.__name__}")
+                with engine.begin() as conn:
+                    migration(conn)
+                    conn.execute(schema_migrations.insert().values(
+                        version=version, name=migration.__name__, applied_at=datetime.utcnow()
+                    ))
+                applied.append(version)
+        finally:
+            if engine.dialect.name == "postgresql":
+                lock_conn.execute(sqlalchemy.text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATION_LOCK_KEY})
+    return applied
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Apply database schema migrations")
+    parser.add_argument("--target", type=int, help="migrate up to this version")
+    parser.add_argument("--status", action="store_true", help="list migrations without applying them")
+    args = parser.parse_args()
+
+    load_dotenv()
+    engine = create_engine(os.getenv("DATABASE_URL"))
+    if args.status:
+        with engine.begin() as conn:
+            done = applied_versions(conn)
+        for version, migration in MIGRATIONS:
+            print(f"{version:>4}  {'applied' if version in done else 'pending':<8} {migration.__name__}")
+        return
+
+    applied = migrate(engine, args.target)
+    print(f"Applied {len(applied)} migration(s)" if applied else "Database schema is up to date")
+
+
+if __name__ == "__main__":
+    main()
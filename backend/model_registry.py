@@ -0,0 +1,167 @@
+# model_registry.py
+import os
+import threading
+
+# Loaded models, keyed by (kind, name, device, precision, backend)
+_models = {}
+_locks = {}
+_registry_lock = threading.Lock()
+
+# Defaults for callers that do not pick a precision or backend explicitly
+WHISPER_PRECISION = os.getenv("WHISPER_PRECISION", "fp32")
+CLASSIFIER_PRECISION = os.getenv("CLASSIFIER_PRECISION", "fp32")
+CLASSIFIER_BACKEND = os.getenv("CLASSIFIER_BACKEND", "torch")
+INFERENCE_THREADS = os.getenv("INFERENCE_THREADS")
+
+
+def set_inference_threads(threads):
+    """Set the CPU thread count for models loaded from now on"""
+    global INFERENCE_THREADS
+    import inference_backends
+    INFERENCE_THREADS = threads
+    inference_backends.set_num_threads(threads)
+
+
+def _default_device():
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def _resolve(device, precision, backend="torch"):
+    """Validate an inference configuration and fill in the device"""
+    from inference_backends import BACKENDS, PRECISIONS
+
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unsupported precision: {precision}")
+    if backend not in BACKENDS:
+        raise ValueError(f"Unsupported backend: {backend}")
+
+    # int8 and ONNX Runtime paths are CPU-only; fp16 needs a GPU
+    if precision == "int8" or backend == "onnx":
+        device = device or "cpu"
+        if device != "cpu":
+            raise ValueError(f"{backend}/{precision} inference only runs on cpu")
+    device = device or _default_device()
+    if precision == "fp16" and device == "cpu":
+        raise ValueError("fp16 inference needs a GPU")
+    return device
+
+
+def _get(key, loader):
+    """Return the cached model for key, loading it at most once per process"""
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _registry_lock:
+        lock = _locks.setdefault(key, threading.Lock())
+    with lock:
+        if key not in _models:
+            kind, name, device, precision, backend = key
+            print(f"Loading {kind} model {name} ({device}, {precision}, {backend})...")
+            _models[key] = loader()
+    return _models[key]
+
+
+def get_whisper_model(name="base", device=None, precision=None):
+    """Shared Whisper model"""
+    precision = precision or WHISPER_PRECISION
+    device = _resolve(device, precision)
+
+    def load():
+        import whisper
+        import inference_backends
+        inference_backends.set_num_threads(INFERENCE_THREADS)
+        model = whisper.load_model(name, device=device)
+        if precision == "int8":
+            return inference_backends.quantize_whisper_int8(model)
+        return model.half() if precision == "fp16" else model
+
+    return _get(("whisper", name, device, precision, "torch"), load)
+
+
+def get_classifier(model=None, device=None, precision=None, backend=None):
+    """Shared zero-shot classification pipeline (the transformers default model when None)"""
+    precision = precision or CLASSIFIER_PRECISION
+    backend = backend or CLASSIFIER_BACKEND
+    device = _resolve(device, precision, backend)
+
+    def load():
+        import torch
+        from transformers import pipeline
+        import inference_backends
+        inference_backends.set_num_threads(INFERENCE_THREADS)
+        dtype = torch.float16 if precision == "fp16" else torch.float32
+        classifier = pipeline("zero-shot-classification", model=model, device=device, torch_dtype=dtype)
+        if backend == "onnx":
+            return inference_backends.to_onnx(classifier, precision, INFERENCE_THREADS)
+        if precision == "int8":
+            classifier.model = inference_backends.quantize_int8(classifier.model)
+        return classifier
+
+    return _get(("classifier", model or "default", device, precision, backend), load)
+
+
+def _keep_sentence_pipes(nlp):
+    """Run only the spaCy components needed for sentence boundaries"""
+    if "senter" in nlp.component_names:
+        needed = {"senter"}
+        nlp.enable_pipe("senter")
+    elif "parser" in nlp.component_names:
+        needed = {"tok2vec", "parser"}
+    else:
+        needed = {"sentencizer"}
+        if "sentencizer" not in nlp.component_names:
+            nlp.add_pipe("sentencizer", first=True)
+
+    for pipe_name in nlp.pipe_names:
+        if pipe_name not in needed:
+            nlp.disable_pipe(pipe_name)
+
+
+def get_spacy_model(name, sentences_only=False):
+    """Shared spaCy pipeline
+
+    sentences_only returns a separate copy that only splits sentences, so
+    disabling its components never affects other users of the full model.
+    """
+    def load():
+        import spacy
+        nlp = spacy.load(name)
+        if sentences_only:
+            _keep_sentence_pipes(nlp)
+        return nlp
+
+    variant = f"{name}:sentences" if sentences_only else name
+    return _get(("spacy", variant, "cpu", "fp32", "spacy"), load)
+
+
+def loaded_models():
+    """Keys of the models loaded in this process"""
+    return list(_models)
+
+
+def preload(specs):
+    """Load models ahead of time, e.g. in a server master before it forks
+
+    specs are "kind:name" strings such as "whisper:base",
+    "classifier:facebook/bart-large-mnli" or "spacy:en_core_web_sm".
+    Forked workers then share the read-only weights copy-on-write.
+    """
+    for spec in specs:
+        kind, _, name = spec.strip().partition(":")
+        if kind == "whisper":
+            get_whisper_model(name or "base")
+        elif kind == "classifier":
+            get_classifier(name or None)
+        elif kind == "spacy":
+            get_spacy_model(name)
+        else:
+            raise ValueError(f"Unknown model kind: {kind}")
+
+
+def preload_from_env(variable="PRELOAD_MODELS"):
+    """Preload the comma-separated model specs listed in an environment variable"""
+    specs = [spec for spec in os.getenv(variable, "").split(",") if spec.strip()]
+    if specs:
+        preload(specs)
@@ -1,30 +1,31 @@
 import sounddevice as sd
 import numpy as np
-import requests
 import json
-import whisper
-import spacy
 from datetime import datetime
 import soundfile as sf
-import tempfile
-from transformers import pipeline
+import os
+import argparse
+from term_matcher import TermMatcher
+from streaming_transcriber import StreamingTranscriber
+import model_registry
+from report_outbox import ReportOutbox
+from report_models import report_payload, symptom_summary
+import result_cache
+import instrumentation
 
 class AudioProcessor:
-    def __init__(self):
-        print("Loading Whisper model...")
-        self.whisper_model = whisper.load_model("base")
-        
-        print("Loading medical NLP model...")
-        try:
-            # Use advanced medical spaCy model
-            self.nlp = spacy.load("en_core_sci_md")
-        except OSError:
-            print("Medical spaCy model not found. Please install with:")
-            print("pip install https://s3-us-west-2.amazonaws.com/ai2-s2-scispacy/releases/v0.4.0/en_core_sci_md-0.4.0.tar.gz")
-            raise
-        
-        # Initialize zero-shot classifier for advanced analysis
-        self.classifier = pipeline("zero-shot-classification")
+    def __init__(self, whisper_precision=None, classifier_backend=None, classifier_precision=None):
+        # Models come from the shared registry and load on first use;
+        # None falls back to the registry's precision/backend defaults
+        self.whisper_precision = whisper_precision
+        self.classifier_backend = classifier_backend
+        self.classifier_precision = classifier_precision
+        self.cache = result_cache.get_cache()
+        self._nlp = None
+        
+        self.api_url = "http://localhost:8000/api/reports"
+        # The sender starts on the first report queued
+        self.outbox = ReportOutbox(self.api_url)
         
         # Medical terminology and analysis components
         self.medical_terms = {
@@ -37,11 +38,69 @@ class AudioProcessor:
                 "emergency": ["emergency", "immediately", "severe pain", "chest pain"],
                 "urgent": ["urgent", "worrying", "getting worse"],
                 "routine": ["routine", "chronic", "ongoing"]
+            },
+            "history_categories": {
+                "condition": ["diagnosed", "disease", "syndrome"],
+                "medication": ["medicine", "drug", "prescription"],
+                "procedure": ["surgery", "operation"],
+                "allergy": ["allergic", "reaction"]
             }
         }
         
-        print("System ready!")
+        # Phrase vocabularies scanned in a single pass over each transcript
+        self.term_matcher = TermMatcher({
+            "symptom": [
+                "pain", "ache", "discomfort", "swelling", "nausea", 
+                "fatigue", "dizziness", "numbness", "weakness"
+            ],
+            "history": [
+                "diagnosed with", "history of", "previous", 
+                "surgery", "medication", "allergy"
+            ],
+            "urgent": [
+                "severe pain", "chest pain", "difficulty breathing", 
+                "sudden onset", "severe headache"
+            ],
+            "emergency": [
+                "heart attack", "stroke", "cannot breathe", 
+                "uncontrolled bleeding"
+            ]
+        })
+        self.severity_matcher = TermMatcher(self.medical_terms["severity_keywords"])
+        self.history_category_matcher = TermMatcher(self.medical_terms["history_categories"])
         
+        print("System ready!")
+    
+    @property
+    def whisper_model(self):
+        return model_registry.get_whisper_model("base", precision=self.whisper_precision)
+    
+    @property
+    def classifier(self):
+        # Zero-shot classifier for advanced analysis
+        return model_registry.get_classifier(
+            precision=self.classifier_precision,
+            backend=self.classifier_backend
+        )
+    
+    @property
+    def nlp(self):
+        if self._nlp is None:
+            try:
+                # Use advanced medical spaCy model, trimmed to sentence splitting
+                nlp = model_registry.get_spacy_model("en_core_sci_md", sentences_only=True)
+            except OSError:
+                print("Medical spaCy model not found. Please install with:")
+                print("pip install https://s3-us-west-2.amazonaws.com/ai2-s2-scispacy/releases/v0.4.0/en_core_sci_md-0.4.0.tar.gz")
+                raise
+            self._nlp = nlp
+        return self._nlp
+    
+    def _classifier_version(self):
+        precision = self.classifier_precision or model_registry.CLASSIFIER_PRECISION
+        backend = self.classifier_backend or model_registry.CLASSIFIER_BACKEND
+        return f"default:{precision}:{backend}"
+    
     def record_audio(self):
         """Record audio from microphone until stopped"""
         print("\n" + "="*50)
@@ -71,57 +130,98 @@ class AudioProcessor:
         return None
 
     def save_audio(self, audio):
-        """Save audio to temporary file"""
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as temp_audio:
-            sf.write(temp_audio.name, audio, 16000)
-            return temp_audio.name
+        """Archive the recording as a WAV file when AUDIO_ARCHIVE_DIR is set"""
+        archive_dir = os.getenv("AUDIO_ARCHIVE_DIR")
+        if not archive_dir:
+            return None
+        os.makedirs(archive_dir, exist_ok=True)
+        audio_path = os.path.join(archive_dir, f"consultation_{datetime.now():%Y%m%d_%H%M%S}.wav")
+        sf.write(audio_path, audio, 16000)
+        return audio_path
         
-    def transcribe_audio(self, audio_path):
-        """Convert audio to text using Whisper"""
+    def transcribe_audio(self, audio):
+        """Convert a 16 kHz audio buffer (or file path) to text using Whisper"""
         print("Transcribing audio...")
-        result = self.whisper_model.transcribe(audio_path)
+        if not isinstance(audio, str):
+            # Whisper takes the 16 kHz float32 samples directly, skipping ffmpeg
+            audio = np.asarray(audio, dtype=np.float32).reshape(-1)
+        
+        # Identical recordings are only decoded once
+        text = result_cache.cached_transcribe(self.whisper_model, audio, precision=self.whisper_precision,
+                                              cache=self.cache)
+        print("\nTRANSCRIPTION:")
+        print("-"*50)
+        print(text)
+        print("-"*50 + "\n")
+        return text
+    
+    def stream_transcription(self):
+        """Record and transcribe concurrently in ~30 s windows"""
+        transcript = StreamingTranscriber(self.whisper_model).record()
         print("\nTRANSCRIPTION:")
         print("-"*50)
-        print(result["text"])
+        print(transcript)
         print("-"*50 + "\n")
-        return result["text"]
+        return transcript
         
     def advanced_medical_analysis(self, text):
         """Comprehensive medical analysis using advanced NLP techniques"""
-        doc = self.nlp(text)
-        
-        # Advanced analysis components
-        analysis = {
-            "symptoms": self._extract_symptoms(text),
-            "medical_history": self._extract_medical_history(text),
-            "risk_factors": self._identify_risk_factors(text),
-            "urgency": self._assess_urgency(text),
-            "treatment_suggestions": self._suggest_treatments(text),
-            "key_observations": self._extract_key_observations(text)
-        }
+        key = self._analysis_key(text)
+        analysis = self.cache.get(key)
+        if analysis is None:
+            analysis = self._analyze_doc(self.nlp(text))
+            self.cache.set(key, analysis)
         
         # Print detailed analysis report
         self._print_comprehensive_report(analysis)
         
         return analysis
     
-    def _extract_symptoms(self, text):
+    def batch_medical_analysis(self, texts, batch_size=32, n_process=1):
+        """Analyze archived transcripts, parsing them in batches with nlp.pipe"""
+        keys = [self._analysis_key(text) for text in texts]
+        analyses = [self.cache.get(key) for key in keys]
+        
+        # Only transcripts without a cached analysis are parsed
+        misses = [i for i, analysis in enumerate(analyses) if analysis is None]
+        docs = self.nlp.pipe((texts[i] for i in misses), batch_size=batch_size, n_process=n_process)
+        for i, doc in zip(misses, docs):
+            analyses[i] = self._analyze_doc(doc)
+            self.cache.set(keys[i], analyses[i])
+        return analyses
+    
+    def _analysis_key(self, text):
+        return result_cache.text_key("advanced_analysis", text, f"en_core_sci_md:{self._classifier_version()}")
+    
+    def _analyze_doc(self, doc):
+        """Run every analysis stage over one parsed transcript"""
+        # A single term scan shared by the keyword-based stages
+        matches = self.term_matcher.find(doc.text)
+        urgency = self._assess_urgency(matches)
+        
+        # Advanced analysis components
+        return {
+            "symptoms": self._extract_symptoms(doc, matches),
+            "medical_history": self._extract_medical_history(doc, matches),
+            "risk_factors": self._identify_risk_factors(doc.text),
+            "urgency": urgency,
+            "treatment_suggestions": self._suggest_treatments(urgency),
+            "key_observations": self._extract_key_observations(doc.text)
+        }
+    
+    def _extract_symptoms(self, doc, matches):
         """Extract symptoms using medical NLP"""
-        doc = self.nlp(text.lower())
         symptoms = []
-        
-        # Symptom patterns from medical terminology
-        symptom_patterns = [
-            "pain", "ache", "discomfort", "swelling", "nausea", 
-            "fatigue", "dizziness", "numbness", "weakness"
-        ]
+        matches = [m for m in matches if m.category == "symptom"]
         
         for sent in doc.sents:
-            for pattern in symptom_patterns:
-                if pattern in sent.text.lower():
+            seen = set()
+            for match in matches:
+                if sent.start_char <= match.start < sent.end_char and match.term not in seen:
+                    seen.add(match.term)
                     symptoms.append({
-                        "symptom": pattern,
-                        "context": sent.text.strip(),
+                        "symptom": match.term,
+                        "context": sent.text.lower().strip(),
                         "severity": self._determine_symptom_severity(sent.text)
                     })
         
@@ -129,26 +229,24 @@ class AudioProcessor:
     
     def _determine_symptom_severity(self, text):
         """Determine symptom severity"""
-        for level, keywords in self.medical_terms["severity_keywords"].items():
-            if any(keyword in text.lower() for keyword in keywords):
+        found = {match.category for match in self.severity_matcher.find(text)}
+        for level in self.medical_terms["severity_keywords"]:
+            if level in found:
                 return level
         return "unspecified"
     
-    def _extract_medical_history(self, text):
+    def _extract_medical_history(self, doc, matches):
         """Extract medical history mentions"""
-        doc = self.nlp(text.lower())
         history = []
-        
-        history_patterns = [
-            "diagnosed with", "history of", "previous", 
-            "surgery", "medication", "allergy"
-        ]
+        matches = [m for m in matches if m.category == "history"]
         
         for sent in doc.sents:
-            for pattern in history_patterns:
-                if pattern in sent.text:
+            seen = set()
+            for match in matches:
+                if sent.start_char <= match.start < sent.end_char and match.term not in seen:
+                    seen.add(match.term)
                     history.append({
-                        "description": sent.text.strip(),
+                        "description": sent.text.lower().strip(),
                         "category": self._categorize_history_item(sent.text)
                     })
         
@@ -156,15 +254,9 @@ class AudioProcessor:
     
     def _categorize_history_item(self, text):
         """Categorize medical history item"""
-        categories = {
-            "condition": ["diagnosed", "disease", "syndrome"],
-            "medication": ["medicine", "drug", "prescription"],
-            "procedure": ["surgery", "operation"],
-            "allergy": ["allergic", "reaction"]
-        }
-        
-        for category, keywords in categories.items():
-            if any(keyword in text.lower() for keyword in keywords):
+        found = {match.category for match in self.history_category_matcher.find(text)}
+        for category in self.medical_terms["history_categories"]:
+            if category in found:
                 return category
         return "other"
     
@@ -194,31 +286,20 @@ class AudioProcessor:
             print(f"Risk factor analysis error: {e}")
             return []
     
-    def _assess_urgency(self, text):
-        """Assess medical urgency"""
-        urgent_indicators = [
-            "severe pain", "chest pain", "difficulty breathing", 
-            "sudden onset", "severe headache"
-        ]
-        
-        emergency_indicators = [
-            "heart attack", "stroke", "cannot breathe", 
-            "uncontrolled bleeding"
-        ]
-        
+    def _assess_urgency(self, matches):
+        """Assess medical urgency from the transcript's term matches"""
         # Check for emergency indicators
-        for indicator in emergency_indicators:
-            if indicator in text.lower():
-                return {
-                    "level": "emergency",
-                    "recommendation": "Immediate emergency care required"
-                }
+        if any(match.category == "emergency" for match in matches):
+            return {
+                "level": "emergency",
+                "recommendation": "Immediate emergency care required"
+            }
         
         # Check for urgent indicators
-        urgent_matches = [
-            ind for ind in urgent_indicators 
-            if ind in text.lower()
-        ]
+        urgent_matches = []
+        for match in matches:
+            if match.category == "urgent" and match.term not in urgent_matches:
+                urgent_matches.append(match.term)
         
         if urgent_matches:
             return {
@@ -232,10 +313,8 @@ class AudioProcessor:
             "recommendation": "Standard medical follow-up suggested"
         }
     
-    def _suggest_treatments(self, text):
+    def _suggest_treatments(self, urgency):
         """Generate treatment suggestions"""
-        urgency = self._assess_urgency(text)
-        
         # Basic treatment recommendation based on urgency
         treatments = {
             "emergency": [
@@ -259,9 +338,6 @@ class AudioProcessor:
     
     def _extract_key_observations(self, text):
         """Extract key clinical observations"""
-        doc = self.nlp(text)
-        observations = []
-        
         observation_categories = [
             "vital signs", "physical symptoms", 
             "medical conditions", "test results"
@@ -310,57 +386,109 @@ class AudioProcessor:
         
         print("="*50 + "\n")
     
-    def send_to_api(self, data):
-        """Send analysis data to API"""
-        try:
-            url = f"{self.api_url}/reports"
-            response = requests.post(
-                url,
-                json=data,
-                headers={"Content-Type": "application/json"}
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.exceptions.RequestException as e:
-            print(f"Error sending data to API: {e}")
-            return None
+    def build_report(self, transcript, medical_analysis):
+        """The report for a transcript, validated against the API's Report model"""
+        symptoms = []
+        for symptom in medical_analysis["symptoms"]:
+            if symptom["symptom"] not in symptoms:
+                symptoms.append(symptom["symptom"])
+        
+        # The worst severity mentioned with any symptom
+        severities = {symptom["severity"] for symptom in medical_analysis["symptoms"]}
+        severity = next((level for level in self.medical_terms["severity_keywords"] if level in severities), None)
+        
+        urgency = medical_analysis["urgency"]
+        return report_payload(
+            datetime.now(),
+            transcript,
+            # Only symptoms are in this pipeline's vocabulary
+            {"conditions": [], "medications": [], "symptoms": symptoms, "procedures": []},
+            {
+                "symptoms": symptom_summary(symptoms),
+                "severity": {"classification": severity} if severity else {},
+                "urgency": {"classification": urgency["level"], **urgency}
+            }
+        )
+    
+    def send_to_api(self, report_data):
+        """Queue analysis data for upload to the API"""
+        # Persisted locally first; the outbox sender delivers it in the background
+        outbox_id = self.outbox.put(report_data)
+        print(f"\nReport queued for upload (outbox #{outbox_id}, {self.outbox.pending_count()} pending)")
+        return {"outbox_id": outbox_id}
 
-    def process_conversation(self):
+    def process_conversation(self, streaming=False):
         """Main processing pipeline"""
-        try:
-            audio = self.record_audio()
-            
-            if audio is not None:
-                audio_path = self.save_audio(audio)
-                transcript = self.transcribe_audio(audio_path)
+        with instrumentation.job("conversation", streaming=streaming) as job:
+            try:
+                if streaming:
+                    with instrumentation.stage("record_transcribe"):
+                        transcript = self.stream_transcription()
+                else:
+                    with instrumentation.stage("record"):
+                        audio = self.record_audio()
+                    if audio is None:
+                        return None
+                    with instrumentation.stage("save"):
+                        self.save_audio(audio)
+                    with instrumentation.stage("transcribe"):
+                        transcript = self.transcribe_audio(audio)
                 
                 # Perform advanced medical analysis
-                medical_analysis = self.advanced_medical_analysis(transcript)
+                with instrumentation.stage("analyze"):
+                    medical_analysis = self.advanced_medical_analysis(transcript)
                 
-                # Prepare combined report data
-                report_data = {
-                    "timestamp": datetime.now().isoformat(),
-                    "transcript": transcript,
-                    "medical_analysis": medical_analysis
-                }
+                # Prepare report data in the API's shape
+                report_data = self.build_report(transcript, medical_analysis)
                 
                 # Send to API (optional)
-                response = self.send_to_api(report_data)
+                with instrumentation.stage("upload"):
+                    response = self.send_to_api(report_data)
                 if response:
-                    print("\nReport and analysis saved successfully")
+                    print("\nReport and analysis saved for upload")
                     return response
-                    
-            return None
-            
-        except Exception as e:
-            print(f"\nError: {str(e)}")
-            return None
+                        
+                return None
+                
+            except Exception as e:
+                job.status = "error"
+                print(f"\nError: {str(e)}")
+                return None
 
 def main():
-    processor = AudioProcessor()
+    parser = argparse.ArgumentParser(description="Record and analyze a medical conversation")
+    parser.add_argument("--stream", action="store_true",
+                        help="transcribe in the background while recording")
+    parser.add_argument("--whisper-precision", choices=["fp32", "fp16", "int8"],
+                        help="Whisper weights precision (default: $WHISPER_PRECISION or fp32)")
+    parser.add_argument("--classifier-backend", choices=["torch", "onnx"],
+                        help="zero-shot classifier runtime (default: $CLASSIFIER_BACKEND or torch)")
+    parser.add_argument("--classifier-precision", choices=["fp32", "fp16", "int8"],
+                        help="zero-shot classifier precision (default: $CLASSIFIER_PRECISION or fp32)")
+    parser.add_argument("--threads", type=int, help="CPU threads used for inference")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on this port while running")
+    args = parser.parse_args()
+    if args.metrics_port:
+        instrumentation.serve_metrics(args.metrics_port)
+    if args.threads:
+        model_registry.set_inference_threads(args.threads)
+
+    processor = AudioProcessor(
+        whisper_precision=args.whisper_precision,
+        classifier_backend=args.classifier_backend,
+        classifier_precision=args.classifier_precision
+    )
+    # Deliver anything an earlier run left queued
+    processor.outbox.start()
     print("\nStarting advanced medical transcription system...")
     print("Press Ctrl+C to stop recording when finished speaking")
-    processor.process_conversation()
+    processor.process_conversation(streaming=args.stream)
+
+    # Give the sender a moment to deliver; anything left is retried on the next run
+    if not processor.outbox.flush(timeout=30):
+        print(f"{processor.outbox.pending_count()} report(s) still queued; they will be sent on the next run")
+    processor.outbox.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
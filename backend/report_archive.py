@@ -0,0 +1,171 @@
+# report_archive.py
+"""Partition maintenance and cold-transcript archival for the reports table
+
+Run daily (e.g. from cron) after migrations:
+
+    python report_archive.py --older-than-days 365
+
+On Postgres it first creates the monthly partitions for the coming months.
+It then moves transcripts older than the cutoff into report_transcripts_cold
+as zstd frames. Archived reports keep their entities and labels, but their
+transcript text no longer feeds search_vector.
+"""
+import os
+from datetime import date, datetime, timedelta
+
+import sqlalchemy
+import zstandard
+from sqlalchemy import create_engine
+from dotenv import load_dotenv
+
+from schema import reports, report_transcripts_cold
+
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "365"))
+ARCHIVE_BATCH = 500
+ZSTD_LEVEL = int(os.getenv("ARCHIVE_ZSTD_LEVEL", "19"))
+PARTITION_MONTHS_AHEAD = 3
+
+_decompressor = zstandard.ZstdDecompressor()
+
+
+def compress_transcript(text, compressor):
+    return compressor.compress(text.encode("utf-8"))
+
+
+def decompress_transcript(blob):
+    return _decompressor.decompress(blob).decode("utf-8")
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    years, month = divmod(day.month - 1 + months, 12)
+    return date(day.year + years, month + 1, 1)
+
+
+def partition_name(month):
+    return f"reports_y{month.year}m{month.month:02d}"
+
+
+def ensure_partitions(conn, first=None, months_ahead=PARTITION_MONTHS_AHEAD):
+    """Create monthly partitions of reports from first through months_ahead months from now
+
+    Rows that landed in reports_default for a month being created (clock
+    skew on an edge device, say) are moved into the new partition.
+    """
+    month = month_start(first or date.today())
+    last = add_months(month_start(date.today()), months_ahead)
+    created = 0
+    while month <= last:
+        name = partition_name(month)
+        exists = conn.execute(sqlalchemy.text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+        if exists is None:
+            bounds = {"start": month, "end": add_months(month, 1)}
+            in_range = '"timestamp" >= :start AND "timestamp" < :end'
+            conn.execute(sqlalchemy.text(
+                "CREATE TEMP TABLE reports_moving ON COMMIT DROP AS "
+                f'SELECT id, "timestamp", transcript, medical_entities, analysis FROM reports_default WHERE {in_range}'
+            ), bounds)
+            conn.execute(sqlalchemy.text(f"DELETE FROM reports_default WHERE {in_range}"), bounds)
+            conn.execute(sqlalchemy.text(
+                f"CREATE TABLE {name} PARTITION OF reports "
+                f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+            ))
+            conn.execute(sqlalchemy.text(
+                'INSERT INTO reports (id, "timestamp", transcript, medical_entities, analysis) '
+                'SELECT id, "timestamp", transcript, medical_entities, analysis FROM reports_moving'
+            ))
+            conn.execute(sqlalchemy.text("DROP TABLE reports_moving"))
+            created += 1
+        month = add_months(month, 1)
+    return created
+
+
+def archive_transcripts(engine, older_than_days=ARCHIVE_AFTER_DAYS, batch_size=ARCHIVE_BATCH, level=ZSTD_LEVEL):
+    """Move transcripts older than the cutoff into the compressed cold table; returns (reports, bytes saved)"""
+    cutoff = datetime.now() - timedelta(days=older_than_days)
+    compressor = zstandard.ZstdCompressor(level=level)
+    archived = 0
+    saved = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                sqlalchemy.select(reports.c.id, reports.c.timestamp, reports.c.transcript)
+                .where(reports.c.timestamp < cutoff, reports.c.transcript.is_not(None))
+                .order_by(reports.c.timestamp)
+                .limit(batch_size)
+            ).fetchall()
+            if not rows:
+                break
+
+            now = datetime.now()
+            cold_rows = []
+            for row in rows:
+                blob = compress_transcript(row.transcript, compressor)
+                saved += len(row.transcript.encode("utf-8")) - len(blob)
+                cold_rows.append({
+                    "report_id": row.id,
+                    "timestamp": row.timestamp,
+                    "transcript_zstd": blob,
+                    "archived_at": now
+                })
+            conn.execute(report_transcripts_cold.insert(), cold_rows)
+            # The timestamp predicate lets Postgres prune to the old partitions
+            conn.execute(
+                reports.update()
+                .where(reports.c.id.in_([row.id for row in rows]), reports.c.timestamp < cutoff)
+                .values(transcript=None)
+            )
+        archived += len(rows)
+    return archived, saved
+
+
+def vacuum_archived_partitions(engine, older_than_days=ARCHIVE_AFTER_DAYS):
+    """Rewrite fully archived monthly partitions so the freed space goes back to the OS
+
+    Old partitions take no new rows, so plain VACUUM would leave the space
+    unused; VACUUM FULL only locks the cold partition it rewrites.
+    """
+    cutoff = month_start(date.today() - timedelta(days=older_than_days))
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        names = conn.execute(sqlalchemy.text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'reports' AND child.relname LIKE 'reports_y%'"
+        )).scalars().all()
+        for name in sorted(names):
+            year, month = int(name[9:13]), int(name[14:16])
+            if add_months(date(year, month, 1), 1) <= cutoff:
+                conn.execute(sqlalchemy.text(f"VACUUM FULL {name}"))
+                print(f"Vacuumed {name}")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintain report partitions and archive cold transcripts")
+    parser.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH)
+    parser.add_argument("--vacuum-full", action="store_true", help="rewrite fully archived partitions (Postgres)")
+    args = parser.parse_args()
+
+    load_dotenv()
+    engine = create_engine(os.getenv("DATABASE_URL"))
+
+    if engine.dialect.name == "postgresql":
+        with engine.begin() as conn:
+            created = ensure_partitions(conn)
+        print(f"Created {created} partition(s)")
+
+    archived, saved = archive_transcripts(engine, args.older_than_days, args.batch_size)
+    print(f"Archived {archived} transcript(s), {saved / 1024 / 1024:.1f} MiB saved before vacuum")
+
+    if args.vacuum_full and engine.dialect.name == "postgresql":
+        vacuum_archived_partitions(engine, args.older_than_days)
+
+
+if __name__ == "__main__":
+    main()
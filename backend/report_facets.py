@@ -0,0 +1,56 @@
+# report_facets.py
+# Rows for the report_entities and report_labels side tables, shared by the
+# API (on insert) and migrations.py (backfill) so both normalise alike
+
+
+def normalize(value):
+    return " ".join(str(value).lower().split())
+
+
+def entity_rows(report_id, timestamp, medical_entities):
+    """One row per distinct (category, term) in medical_entities"""
+    rows = {}
+    for category, terms in (medical_entities or {}).items():
+        for term in terms or []:
+            term = normalize(term)
+            if term:
+                rows[(category, term)] = {
+                    "report_id": report_id,
+                    "timestamp": timestamp,
+                    "category": category,
+                    "term": term
+                }
+    return list(rows.values())
+
+
+def label_rows(report_id, timestamp, analysis):
+    """One row per classified analysis category"""
+    rows = []
+    for category, result in (analysis or {}).items():
+        if not isinstance(result, dict) or "classification" not in result:
+            continue
+        rows.append({
+            "report_id": report_id,
+            "timestamp": timestamp,
+            "category": category,
+            "label": normalize(result["classification"]),
+            "confidence": result.get("confidence")
+        })
+    return rows
+
+
+def parse_facet(value, default_category=None):
+    """Split a "category:value" filter; the category may be omitted if a default is allowed"""
+    category, separator, term = value.partition(":")
+    if not separator:
+        return default_category, normalize(value)
+    return category.strip(), normalize(term)
+
+
+def stat_keys(timestamp, medical_entities, analysis):
+    """(day, dimension, value) keys a report adds one to in report_daily_stats"""
+    day = timestamp.date()
+    keys = [(day, "reports", "")]
+    keys.extend((day, f"label:{row['category']}", row["label"]) for row in label_rows(None, None, analysis))
+    keys.extend((day, f"entity:{row['category']}", row["term"]) for row in entity_rows(None, None, medical_entities))
+    return keys
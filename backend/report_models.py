@@ -0,0 +1,51 @@
+# report_models.py
+"""The report payload accepted by POST /api/reports/ and /api/reports/bulk
+
+Kept apart from fastapi_backend so clients such as batch_transcribe.py can
+validate what they send without importing the app.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel, Field
+
+
+class MedicalEntities(BaseModel):
+    conditions: List[str]
+    medications: List[str]
+    symptoms: List[str]
+    procedures: List[str]
+
+class Analysis(BaseModel):
+    symptoms: Dict
+    severity: Dict
+    urgency: Dict
+
+class Report(BaseModel):
+    timestamp: datetime
+    transcript: str
+    medical_entities: MedicalEntities
+    analysis: Analysis
+
+class ReportSubmission(Report):
+    # Chosen by the client; a report sent again with the same key is stored once
+    idempotency_key: Optional[str] = Field(None, min_length=1, max_length=128)
+
+
+def symptom_summary(symptoms):
+    """The analysis "symptoms" entry for a list of extracted symptom terms"""
+    # No classifier has a symptom category; report the extracted ones
+    return {"classification": symptoms[0] if symptoms else "none", "mentioned": symptoms}
+
+
+def report_payload(timestamp, transcript, medical_entities, analysis):
+    """A Report as JSON-ready data, for the outbox or a bulk request
+
+    Raises pydantic.ValidationError if the report would be rejected by the API.
+    """
+    return Report.model_validate({
+        "timestamp": timestamp,
+        "transcript": transcript,
+        "medical_entities": medical_entities,
+        "analysis": analysis
+    }).model_dump(mode="json")
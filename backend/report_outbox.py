@@ -0,0 +1,307 @@
+# report_outbox.py
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_OUTBOX_PATH = os.getenv(
+    "OUTBOX_PATH",
+    os.path.join(os.path.expanduser("~"), ".local", "share", "healthcloud", "outbox.sqlite3")
+)
+
+
+class ReportOutbox:
+    """Durable store-and-forward queue for reports bound for the API
+
+    Reports are committed to a local SQLite file before anything touches
+    the network. A background thread drains them in batches to the bulk
+    endpoint over a pooled session, backing off exponentially while the
+    API is unreachable or refuses the request, and picks up where it left
+    off after a restart. Only reports the API rejects individually are
+    parked in the dead letter table; redrive() queues them again.
+
+    Several senders may share one outbox file: each claims its batch for a
+    lease before posting it. Every report carries an idempotency key the
+    API dedupes on, so a batch sent again after a lost response, or after
+    a lease ran out mid-request, is not stored twice. The sender starts on
+    the first put(), or explicitly with start() to drain an earlier backlog.
+    """
+
+    def __init__(self, api_url, path=DEFAULT_OUTBOX_PATH, batch_size=50, timeout=(5, 30),
+                 base_backoff=2, max_backoff=300):
+        self.bulk_url = api_url.rstrip("/") + "/bulk"
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        # Long enough to outlast a request that is still in flight
+        self.lease = (sum(timeout) if isinstance(timeout, tuple) else timeout) + 30
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, created_at REAL NOT NULL, "
+            "attempts INTEGER NOT NULL DEFAULT 0, next_attempt REAL NOT NULL, last_error TEXT)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS dead_letter ("
+            "id INTEGER PRIMARY KEY, payload TEXT NOT NULL, created_at REAL NOT NULL, error TEXT)"
+        )
+        # Columns added since the first release; older outbox files gain them here
+        self._add_columns("outbox", {"idempotency_key": "TEXT", "claimed_by": "TEXT", "claimed_until": "REAL"})
+        self._add_columns("dead_letter", {"idempotency_key": "TEXT"})
+        self._conn.execute(
+            "UPDATE outbox SET idempotency_key = lower(hex(randomblob(16))) WHERE idempotency_key IS NULL"
+        )
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=2)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update({"Content-Type": "application/json"})
+
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def _add_columns(self, table, columns):
+        existing = {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}
+        for name, kind in columns.items():
+            if name not in existing:
+                self._conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+
+    def start(self):
+        """Start the background sender"""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout=10):
+        """Stop the sender; unsent reports stay in the outbox"""
+        self._stopping.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # Hand anything still claimed to the other senders straight away
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET claimed_by = NULL, claimed_until = NULL WHERE claimed_by = ?",
+                (self.owner,)
+            )
+
+    def put(self, report):
+        """Persist a report for delivery and return its outbox id"""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO outbox (payload, created_at, next_attempt, idempotency_key) VALUES (?, ?, ?, ?)",
+                (json.dumps(report), now, now, uuid.uuid4().hex)
+            )
+        self.start()
+        self._wake.set()
+        return cursor.lastrowid
+
+    def pending_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def dead_letter_count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM dead_letter").fetchone()[0]
+
+    def redrive(self):
+        """Queue every dead-lettered report for delivery again; the number moved"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                moved = self._conn.execute(
+                    "INSERT INTO outbox (id, payload, created_at, next_attempt, idempotency_key) "
+                    "SELECT id, payload, created_at, ?, coalesce(idempotency_key, lower(hex(randomblob(16)))) "
+                    "FROM dead_letter",
+                    (now,)
+                ).rowcount
+                self._conn.execute("DELETE FROM dead_letter")
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self._wake.set()
+        return moved
+
+    def flush(self, timeout=30):
+        """Wait up to timeout seconds for the outbox to drain; True if it did"""
+        deadline = time.time() + timeout
+        self._wake.set()
+        while time.time() < deadline:
+            if self.pending_count() == 0:
+                return True
+            time.sleep(0.2)
+        return self.pending_count() == 0
+
+    def _run(self):
+        failures = 0
+        while not self._stopping.is_set():
+            try:
+                self._wake.clear()
+                batch = self._due_batch()
+                if batch:
+                    self._send(batch)
+                    failures = 0
+                    continue
+
+                # Sleep until the next retry is due or a new report arrives
+                self._wake.wait(self._seconds_until_due())
+                failures = 0
+            except Exception as e:
+                # Keep the sender alive through local errors (e.g. SQLite busy or full)
+                delay = min(self.max_backoff, self.base_backoff * 2 ** failures)
+                failures += 1
+                print(f"Outbox: sender error, retrying in {delay:.0f}s: {e!r}")
+                self._stopping.wait(delay)
+
+    def _due_batch(self):
+        """Claim the oldest due reports no other sender holds; (id, payload, attempts, key) rows"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                batch = self._conn.execute(
+                    "SELECT id, payload, attempts, idempotency_key FROM outbox "
+                    "WHERE next_attempt <= ? AND (claimed_until IS NULL OR claimed_until <= ?) "
+                    "ORDER BY id LIMIT ?",
+                    (now, now, self.batch_size)
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET claimed_by = ?, claimed_until = ? WHERE id = ?",
+                    [(self.owner, now + self.lease, row[0]) for row in batch]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return batch
+
+    def _seconds_until_due(self):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(MAX(next_attempt, coalesce(claimed_until, 0))) FROM outbox"
+            ).fetchone()
+        if row[0] is None:
+            return None
+        return max(0.0, row[0] - time.time())
+
+    def _send(self, batch):
+        body = json.dumps([
+            {**json.loads(payload), "idempotency_key": key} for _, payload, _, key in batch
+        ])
+        try:
+            response = self.session.post(self.bulk_url, data=body, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            self._retry(batch, str(e))
+            return
+
+        # A refused request says nothing about the individual reports: a proxy,
+        # an auth or rate limit, or a deployment in progress; keep them queued
+        if response.status_code >= 400:
+            if response.status_code == 413 and len(batch) > 1:
+                # Over the API's bulk limits; send smaller batches from now on
+                self.batch_size = max(1, len(batch) // 2)
+            self._retry(batch, f"HTTP {response.status_code}: {response.text[:200]}")
+            return
+
+        # The API reports each item; delivered ones are removed, invalid ones
+        # parked and anything else tried again
+        try:
+            results = [(batch[result["index"]][0], result["status"], result.get("error"))
+                       for result in response.json()["results"]]
+        except (ValueError, KeyError, IndexError, TypeError):
+            # Not our API answering, e.g. a captive portal page
+            self._retry(batch, f"HTTP {response.status_code} with unexpected body: {response.text[:200]}")
+            return
+        delivered, rejected = [], []
+        for row_id, status, error in results:
+            if status == "created":
+                delivered.append(row_id)
+            elif status == "invalid":
+                rejected.append((row_id, error))
+        # Any other status, or an item missing from the results, is not settled
+        settled = set(delivered) | {row_id for row_id, _ in rejected}
+        unsettled = [row for row in batch if row[0] not in settled]
+        with self._lock:
+            self._conn.executemany("DELETE FROM outbox WHERE id = ?", [(row_id,) for row_id in delivered])
+        if rejected:
+            self._dead_letter(rejected)
+        if unsettled:
+            self._retry(unsettled, "not confirmed by the API")
+        print(f"Outbox: delivered {len(delivered)} report(s), rejected {len(rejected)}")
+
+    def _retry(self, batch, error):
+        """Back off exponentially, with jitter, before the next attempt"""
+        now = time.time()
+        updates = []
+        for row_id, _, attempts, _ in batch:
+            delay = min(self.max_backoff, self.base_backoff * 2 ** attempts) * random.uniform(0.5, 1.0)
+            updates.append((now + delay, error, row_id))
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1, next_attempt = ?, last_error = ?, "
+                "claimed_by = NULL, claimed_until = NULL WHERE id = ?",
+                updates
+            )
+        print(f"Outbox: upload failed, will retry {len(batch)} report(s): {error}")
+
+    def _dead_letter(self, rows):
+        with self._lock:
+            self._conn.execute("BEGIN")
+            for row_id, error in rows:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO dead_letter (id, payload, created_at, error, idempotency_key) "
+                    "SELECT id, payload, created_at, ?, idempotency_key FROM outbox WHERE id = ?",
+                    (error, row_id)
+                )
+                self._conn.execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+            self._conn.execute("COMMIT")
+        print(f"Outbox: {len(rows)} report(s) rejected by the API, kept in dead_letter")
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Deliver queued reports, e.g. as a service on edge devices")
+    parser.add_argument("--api-url", default="http://localhost:8000/api/reports")
+    parser.add_argument("--path", default=DEFAULT_OUTBOX_PATH)
+    parser.add_argument("--redrive", action="store_true",
+                        help="queue dead-lettered reports again (e.g. after fixing the API) and exit")
+    args = parser.parse_args()
+
+    outbox = ReportOutbox(args.api_url, path=args.path)
+    if args.redrive:
+        print(f"Queued {outbox.redrive()} dead-lettered report(s) for delivery")
+        return
+    print(f"Delivering {outbox.pending_count()} pending report(s) to {outbox.bulk_url}")
+    outbox.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        outbox.stop()
+
+
+if __name__ == "__main__":
+    main()
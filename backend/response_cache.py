@@ -0,0 +1,73 @@
+# response_cache.py
+import hashlib
+import time
+from collections import OrderedDict
+
+
+class CachedBody:
+    """A serialized JSON body with its ETag
+
+    No Last-Modified: the entry's creation time says nothing about when the
+    data changed, and at one-second resolution it would answer 304 for a
+    page rebuilt within the same second. The ETag is the body's hash.
+    """
+
+    __slots__ = ("body", "etag", "expires")
+
+    def __init__(self, body, ttl):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.expires = time.monotonic() + ttl if ttl else None
+
+    @property
+    def headers(self):
+        return {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+
+    def matches(self, if_none_match):
+        """Whether a conditional GET can be answered with 304 Not Modified"""
+        if not if_none_match:
+            return False
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or self.etag in tags
+
+
+class ResponseCache:
+    """In-process LRU of serialized response bodies with an optional TTL
+
+    Per worker: clear() only reaches the worker that handled the insert,
+    so the TTL bounds how stale other workers can be.
+    """
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self.generation = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires is not None and entry.expires < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key, body, generation=None):
+        """Cache a body; skipped if the cache was cleared since generation was read"""
+        entry = CachedBody(body, self.ttl)
+        if generation is not None and generation != self.generation:
+            return entry
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+        self.generation += 1
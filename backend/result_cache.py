@@ -0,0 +1,123 @@
+# result_cache.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+DEFAULT_CACHE_PATH = os.getenv(
+    "RESULT_CACHE_PATH",
+    os.path.join(os.path.expanduser("~"), ".cache", "healthcloud", "results.sqlite3")
+)
+DEFAULT_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Bump when extraction/analysis logic changes so stale results are not reused
+ANALYSIS_VERSION = "1"
+
+
+def audio_key(audio, model_version):
+    """Cache key for a transcription: the audio content plus the model that decodes it"""
+    digest = hashlib.sha256(model_version.encode())
+    if isinstance(audio, str):
+        with open(audio, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    else:
+        digest.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+    return "audio:" + digest.hexdigest()
+
+
+def text_key(namespace, text, model_version):
+    """Cache key for an analysis of a transcript"""
+    digest = hashlib.sha256(f"{namespace}\0{model_version}\0{ANALYSIS_VERSION}\0".encode())
+    digest.update(text.encode())
+    return f"{namespace}:" + digest.hexdigest()
+
+
+class ResultCache:
+    """Size-bounded on-disk JSON store with least-recently-used eviction
+
+    Backed by SQLite, so several processes on one machine can share it.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed)")
+
+    def get(self, key):
+        """Return the cached value, or None on a miss"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store a JSON-serialisable value, evicting the least recently used entries"""
+        blob = json.dumps(value).encode()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, blob, len(blob), time.time())
+            )
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = self._conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                break
+            self._conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key, _ in oldest])
+            total -= sum(size for _, size in oldest)
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_cache():
+    """Process-wide cache at RESULT_CACHE_PATH"""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = ResultCache()
+    return _default_cache
+
+
+def cached_transcribe(model, audio, model_name="base", precision=None, cache=None):
+    """Whisper transcript of a 16 kHz buffer (or file), decoded once per recording and model"""
+    import audio_segmentation
+    import instrumentation
+    import model_registry
+
+    cache = get_cache() if cache is None else cache
+    version = f"whisper:{model_name}:{precision or model_registry.WHISPER_PRECISION}:{audio_segmentation.CACHE_TAG}"
+    key = audio_key(audio, version)
+    text = cache.get(key)
+    if text is None:
+        # Only the speech is decoded
+        result = audio_segmentation.transcribe(model, audio)
+        instrumentation.add_tokens(instrumentation.whisper_token_count(result))
+        text = result["text"]
+        cache.set(key, text)
+    return text
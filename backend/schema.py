@@ -0,0 +1,113 @@
+# schema.py
+# The one definition of the database schema. The API queries through these
+# tables; migrations.py creates and evolves them in the database.
+import sqlalchemy
+
+metadata = sqlalchemy.MetaData()
+
+# Define database model with combined report and analysis. On Postgres it
+# is range-partitioned by month on timestamp (migration 5), so the primary
+# key there is (id, timestamp).
+reports = sqlalchemy.Table(
+    "reports",
+    metadata,
+    sqlalchemy.Column("id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("timestamp", sqlalchemy.DateTime),
+    sqlalchemy.Column("transcript", sqlalchemy.Text),
+    sqlalchemy.Column("medical_entities", sqlalchemy.JSON),
+    sqlalchemy.Column("analysis", sqlalchemy.JSON)
+)
+
+# Urgency label as stored by the analyzer; rendered literally so the
+# expression index below can be matched by the planner
+URGENCY_LABEL = sqlalchemy.literal_column("(analysis -> 'urgency' ->> 'classification')")
+
+# Indexes backing keyset pagination and the list filters
+sqlalchemy.Index("ix_reports_timestamp_id", reports.c.timestamp, reports.c.id)
+sqlalchemy.Index(
+    "ix_reports_urgency_timestamp_id",
+    sqlalchemy.text("(analysis -> 'urgency' ->> 'classification')"),
+    reports.c.timestamp,
+    reports.c.id
+)
+
+# Generated tsvector column, added on Postgres by migration 2
+SEARCH_VECTOR = sqlalchemy.literal_column("search_vector")
+
+# Entities and classification labels materialized from the JSON columns,
+# kept in sync on insert so cohort filters run as indexed joins
+report_entities = sqlalchemy.Table(
+    "report_entities",
+    metadata,
+    sqlalchemy.Column("report_id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("category", sqlalchemy.String(32), primary_key=True),
+    sqlalchemy.Column("term", sqlalchemy.String(255), primary_key=True),
+    sqlalchemy.Column("timestamp", sqlalchemy.DateTime)
+)
+sqlalchemy.Index(
+    "ix_report_entities_term",
+    report_entities.c.category,
+    report_entities.c.term,
+    report_entities.c.timestamp,
+    report_entities.c.report_id
+)
+
+report_labels = sqlalchemy.Table(
+    "report_labels",
+    metadata,
+    sqlalchemy.Column("report_id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("category", sqlalchemy.String(32), primary_key=True),
+    sqlalchemy.Column("label", sqlalchemy.String(64), nullable=False),
+    sqlalchemy.Column("confidence", sqlalchemy.Float),
+    sqlalchemy.Column("timestamp", sqlalchemy.DateTime)
+)
+sqlalchemy.Index(
+    "ix_report_labels_label",
+    report_labels.c.category,
+    report_labels.c.label,
+    report_labels.c.timestamp,
+    report_labels.c.report_id
+)
+
+# Per-day counts maintained incrementally on insert, so dashboard stats
+# cost a scan over days rather than over reports. Dimensions are
+# "reports", "label:<category>" and "entity:<category>".
+report_daily_stats = sqlalchemy.Table(
+    "report_daily_stats",
+    metadata,
+    sqlalchemy.Column("day", sqlalchemy.Date, primary_key=True),
+    sqlalchemy.Column("dimension", sqlalchemy.String(64), primary_key=True),
+    sqlalchemy.Column("value", sqlalchemy.String(255), primary_key=True),
+    sqlalchemy.Column("count", sqlalchemy.Integer, nullable=False)
+)
+
+# zstd-compressed transcripts moved out of reports by report_archive.py;
+# the reports row keeps a NULL transcript
+report_transcripts_cold = sqlalchemy.Table(
+    "report_transcripts_cold",
+    metadata,
+    sqlalchemy.Column("report_id", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("timestamp", sqlalchemy.DateTime),
+    sqlalchemy.Column("transcript_zstd", sqlalchemy.LargeBinary, nullable=False),
+    sqlalchemy.Column("archived_at", sqlalchemy.DateTime, nullable=False)
+)
+
+# Idempotency keys of submitted reports, so a client retrying a request
+# whose response it lost gets the original report back instead of a copy.
+# Separate from reports, whose partitioned primary key cannot enforce it.
+report_idempotency_keys = sqlalchemy.Table(
+    "report_idempotency_keys",
+    metadata,
+    sqlalchemy.Column("idempotency_key", sqlalchemy.String(128), primary_key=True),
+    sqlalchemy.Column("report_id", sqlalchemy.Integer, nullable=False),
+    sqlalchemy.Column("created_at", sqlalchemy.DateTime, nullable=False)
+)
+
+# Applied migrations, written by migrations.py
+schema_migrations = sqlalchemy.Table(
+    "schema_migrations",
+    metadata,
+    sqlalchemy.Column("version", sqlalchemy.Integer, primary_key=True),
+    sqlalchemy.Column("name", sqlalchemy.String(128), nullable=False),
+    sqlalchemy.Column("applied_at", sqlalchemy.DateTime, nullable=False)
+)
@@ -0,0 +1,101 @@
+# search_index.py
+import math
+import threading
+from collections import defaultdict
+
+from term_matcher import tokenize
+
+# Common words that would otherwise match most transcripts
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have",
+    "i", "in", "is", "it", "its", "my", "of", "on", "or", "so", "that", "the", "this",
+    "to", "was", "were", "with", "you", "your"
+}
+
+
+def terms(text):
+    return [token for token, _, _ in tokenize(text) if token not in STOP_WORDS]
+
+
+def entity_text(medical_entities):
+    """Flatten the extracted entity lists into searchable text"""
+    if not medical_entities:
+        return ""
+    return " ".join(term for values in medical_entities.values() for term in values)
+
+
+class InvertedIndex:
+    """In-process BM25 index over report transcripts and entities
+
+    Fallback for databases without native full-text search (SQLite in
+    development). Entity terms are weighted above transcript terms, like
+    the weighted tsvector used on Postgres.
+    """
+
+    def __init__(self, k1=1.2, b=0.75, entity_weight=2):
+        self.k1 = k1
+        self.b = b
+        self.entity_weight = entity_weight
+        self._postings = defaultdict(dict)
+        self._lengths = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+        self.max_id = 0
+
+    def __len__(self):
+        return len(self._lengths)
+
+    def __contains__(self, report_id):
+        return report_id in self._lengths
+
+    def add(self, report_id, transcript, medical_entities=None):
+        """Index (or re-index) one report"""
+        frequencies = defaultdict(int)
+        for term in terms(transcript or ""):
+            frequencies[term] += 1
+        for term in terms(entity_text(medical_entities)):
+            frequencies[term] += self.entity_weight
+
+        with self._lock:
+            if report_id in self._lengths:
+                self._remove(report_id)
+            for term, frequency in frequencies.items():
+                self._postings[term][report_id] = frequency
+            length = sum(frequencies.values())
+            self._lengths[report_id] = length
+            self._total_length += length
+            self.max_id = max(self.max_id, report_id)
+
+    def search(self, query, limit=20):
+        """Return [(report_id, score)] for reports containing every query term"""
+        query_terms = list(dict.fromkeys(terms(query)))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            postings = [self._postings.get(term, {}) for term in query_terms]
+            if not all(postings):
+                return []
+
+            # Intersect starting from the rarest term
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates.intersection_update(posting)
+
+            count = len(self._lengths)
+            average_length = self._total_length / count
+            scores = {}
+            for posting in postings:
+                idf = math.log(1 + (count - len(posting) + 0.5) / (len(posting) + 0.5))
+                for report_id in candidates:
+                    frequency = posting[report_id]
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[report_id] / average_length)
+                    scores[report_id] = scores.get(report_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:limit]
+
+    def _remove(self, report_id):
+        for posting in self._postings.values():
+            posting.pop(report_id, None)
+        self._total_length -= self._lengths.pop(report_id)
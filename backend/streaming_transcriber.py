@@ -0,0 +1,179 @@
+# streaming_transcriber.py
+import os
+import queue
+import tempfile
+import threading
+import numpy as np
+import sounddevice as sd
+import soundfile as sf
+
+import audio_segmentation
+
+
+class StreamingTranscriber:
+    """Transcribe a live recording in ~30 s windows while it is still running
+
+    Microphone chunks are copied into a fixed-size buffer. A background
+    thread cuts the buffer at the quietest frame near the window length and
+    hands that window to Whisper, so when decoding keeps up only the last
+    window is left once recording stops.
+
+    Audio waiting to be decoded is held in memory up to max_backlog_seconds.
+    On hardware where Whisper runs slower than real time a spooling thread
+    writes the rest to a temporary WAV file, decoded after recording stops,
+    so memory stays bounded by the buffer plus the backlog however long the
+    consultation runs. The input callback itself only enqueues.
+    """
+
+    def __init__(self, model, sample_rate=16000, window_seconds=30, min_window_seconds=10,
+                 max_buffer_seconds=60, frame_ms=30, silence_rms=0.005, max_backlog_seconds=120):
+        self.model = model
+        self.sample_rate = sample_rate
+        self.window_samples = int(window_seconds * sample_rate)
+        self.min_window_samples = int(min_window_seconds * sample_rate)
+        self.frame_samples = int(frame_ms * sample_rate / 1000)
+        self.silence_rms = silence_rms
+
+        self._buffer = np.zeros(int(max_buffer_seconds * sample_rate), dtype=np.float32)
+        self._filled = 0
+        self._incoming = queue.Queue()
+        self._chunks = queue.Queue()
+        self._max_backlog = int(max_backlog_seconds * sample_rate)
+        self._backlog = 0
+        self._backlog_lock = threading.Lock()
+        self._spill = None
+        self._spill_path = None
+        self._segments = []
+        self._spooler = None
+        self._thread = None
+        self.recording = False
+
+    def start(self):
+        """Start the background spooling and transcription threads"""
+        self._spooler = threading.Thread(target=self._spool, daemon=True)
+        self._spooler.start()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def feed(self, chunk):
+        """Queue a chunk of audio; safe to call from the input callback"""
+        self._incoming.put(np.asarray(chunk, dtype=np.float32).reshape(-1).copy())
+
+    def finish(self):
+        """Flush the remaining audio and return the full transcript"""
+        self._incoming.put(None)
+        self._spooler.join()
+        self._thread.join()
+        return " ".join(segment for segment in self._segments if segment)
+
+    def record(self):
+        """Record from the microphone until Ctrl+C, transcribing as it goes"""
+        print("\n" + "="*50)
+        print("Recording (streaming)... Press Ctrl+C to stop")
+        print("Please speak now...")
+
+        def audio_callback(indata, frames, time, status):
+            if status:
+                print(status)
+            self.feed(indata)
+
+        self.start()
+        self.recording = True
+        with sd.InputStream(samplerate=self.sample_rate, channels=1, callback=audio_callback):
+            try:
+                while self.recording:
+                    sd.sleep(100)
+            except KeyboardInterrupt:
+                self.recording = False
+                print("\nRecording stopped!")
+                print("="*50 + "\n")
+
+        print("Finishing transcription...")
+        return self.finish()
+
+    def _spool(self):
+        """Pass chunks on to the decoder, or to the spill file once the backlog is full"""
+        while True:
+            chunk = self._incoming.get()
+            if chunk is None:
+                break
+            # Once spilling, keep spilling so the audio stays in order
+            if self._spill is None:
+                with self._backlog_lock:
+                    fits = self._backlog + chunk.size <= self._max_backlog
+                    if fits:
+                        self._backlog += chunk.size
+                if fits:
+                    self._chunks.put(chunk)
+                    continue
+                print("Transcription is falling behind; buffering audio on disk to decode after recording")
+                handle, self._spill_path = tempfile.mkstemp(prefix="healthcloud-stream-", suffix=".wav")
+                os.close(handle)
+                self._spill = sf.SoundFile(self._spill_path, "w", samplerate=self.sample_rate,
+                                           channels=1, subtype="FLOAT")
+            self._spill.write(chunk)
+
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+        self._chunks.put(None)
+
+    def _run(self):
+        while True:
+            chunk = self._chunks.get()
+            if chunk is None:
+                break
+            with self._backlog_lock:
+                self._backlog -= chunk.size
+            self._consume(chunk)
+
+        # Audio that did not fit in the backlog, in recording order; the
+        # spooler closed the file before queueing the end marker
+        if self._spill_path is not None:
+            try:
+                for block in sf.blocks(self._spill_path, blocksize=self.window_samples, dtype="float32"):
+                    self._consume(block)
+            finally:
+                os.remove(self._spill_path)
+
+        if self._filled:
+            self._flush(self._filled)
+
+    def _consume(self, chunk):
+        while chunk.size:
+            # Make room when a chunk would overflow the buffer
+            space = self._buffer.size - self._filled
+            if space == 0:
+                self._flush(self._cut_point())
+                continue
+            taken = chunk[:space]
+            self._buffer[self._filled:self._filled + taken.size] = taken
+            self._filled += taken.size
+            chunk = chunk[taken.size:]
+
+            if self._filled >= self.window_samples:
+                self._flush(self._cut_point())
+
+    def _cut_point(self):
+        """Pick the quietest frame between the minimum and target window length"""
+        end = min(self._filled, self.window_samples)
+        start = min(self.min_window_samples, end - self.frame_samples)
+        if start <= 0:
+            return end
+
+        energy = audio_segmentation.frame_energy(self._buffer[start:end], self.frame_samples)
+        return start + int(np.argmin(energy)) * self.frame_samples + self.frame_samples // 2
+
+    def _flush(self, cut):
+        """Transcribe buffer[:cut] and shift the rest to the front"""
+        window = self._buffer[:cut]
+        if np.sqrt(np.mean(window ** 2)) >= self.silence_rms:
+            # Carry the previous text as context across window boundaries
+            prompt = self._segments[-1][-200:] if self._segments else None
+            # Pauses inside the window are trimmed as well
+            result = audio_segmentation.transcribe(self.model, window.copy(), initial_prompt=prompt)
+            self._segments.append(result["text"].strip())
+
+        remaining = self._filled - cut
+        self._buffer[:remaining] = self._buffer[cut:self._filled]
+        self._filled = remaining
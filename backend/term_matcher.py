@@ -0,0 +1,78 @@
+# term_matcher.py
+import re
+from collections import namedtuple
+
+# Words, keeping inner hyphens and apostrophes ("x-ray", "check-up", "patient's")
+TOKEN_PATTERN = re.compile(r"\w+(?:[-']\w+)*")
+
+# Trie key holding the (category, term) pairs that end at a node
+_TERMS = None
+
+TermMatch = namedtuple("TermMatch", ["category", "term", "start", "end"])
+
+
+def tokenize(text):
+    """Split text into lowercased (token, start, end) triples"""
+    return [(m.group().lower(), m.start(), m.end()) for m in TOKEN_PATTERN.finditer(text)]
+
+
+class TermMatcher:
+    """Single-pass, word-boundary phrase matcher over categorised vocabularies
+
+    Terms are compiled into a token trie, so a scan costs one walk per token
+    bounded by the longest term, independent of how many terms are loaded.
+    """
+
+    def __init__(self, vocabularies=None):
+        self._root = {}
+        self.categories = []
+        if vocabularies:
+            for category, terms in vocabularies.items():
+                self.add(category, terms)
+
+    def add(self, category, terms):
+        """Add terms under a category"""
+        if category not in self.categories:
+            self.categories.append(category)
+        for term in terms:
+            tokens = tokenize(term)
+            if not tokens:
+                continue
+            node = self._root
+            for token, _, _ in tokens:
+                node = node.setdefault(token, {})
+            entries = node.setdefault(_TERMS, [])
+            if (category, term) not in entries:
+                entries.append((category, term))
+
+    def add_file(self, category, path):
+        """Add terms from a file with one term per line, e.g. a full drug list"""
+        with open(path, encoding="utf-8") as f:
+            self.add(category, (line.strip() for line in f if line.strip()))
+
+    def find(self, text):
+        """Return every term occurrence as TermMatch(category, term, start, end)"""
+        tokens = tokenize(text)
+        matches = []
+        for i, (token, start, _) in enumerate(tokens):
+            node = self._root.get(token)
+            j = i
+            while node is not None:
+                for category, term in node.get(_TERMS, ()):
+                    matches.append(TermMatch(category, term, start, tokens[j][2]))
+                j += 1
+                if j == len(tokens):
+                    break
+                # Multi-word terms only match across plain whitespace
+                if not text[tokens[j - 1][2]:tokens[j][1]].isspace():
+                    break
+                node = node.get(tokens[j][0])
+        return matches
+
+    def extract(self, text):
+        """Return the distinct terms found per category, in order of appearance"""
+        found = {category: [] for category in self.categories}
+        for match in self.find(text):
+            if match.term not in found[match.category]:
+                found[match.category].append(match.term)
+        return found
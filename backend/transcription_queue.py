@@ -0,0 +1,333 @@
+# transcription_queue.py
+import multiprocessing
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from datetime import datetime
+
+import instrumentation
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process lock, every process runs its own pool
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Terminal job states; anything else is still in flight
+FINISHED_STATES = ("completed", "failed")
+
+# Seconds an idle Whisper worker waits before looking for new jobs
+POLL_INTERVAL = 0.5
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue cannot accept another recording"""
+
+
+def load_audio(audio_path):
+    """Decode 16 kHz uploads in-process; other rates go through Whisper's ffmpeg loader"""
+    import soundfile as sf
+
+    try:
+        audio, sample_rate = sf.read(audio_path, dtype="float32", always_2d=True)
+    except RuntimeError:
+        return audio_path
+    if sample_rate != 16000:
+        return audio_path
+    return audio.mean(axis=1)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Transcription jobs in a SQLite file shared by every API and Whisper process
+
+    The table doubles as the queue: submit() inserts a queued row and idle
+    Whisper workers claim() the oldest one, so a job submitted through one
+    API worker can be polled through any other.
+    """
+
+    def __init__(self, path):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcription_jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, audio_path TEXT NOT NULL, "
+            "created_at TEXT NOT NULL, completed_at TEXT, worker INTEGER, transcript TEXT, error TEXT)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_transcription_jobs_status_created "
+            "ON transcription_jobs (status, created_at)"
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def submit(self, audio_path, max_pending, max_finished):
+        """Queue a recording and return its job id, or raise QueueFullError"""
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                pending = self._conn.execute(
+                    "SELECT COUNT(*) FROM transcription_jobs WHERE status = 'queued'"
+                ).fetchone()[0]
+                if pending >= max_pending:
+                    raise QueueFullError("Transcription queue is full")
+                self._conn.execute(
+                    "INSERT INTO transcription_jobs (id, status, audio_path, created_at) VALUES (?, 'queued', ?, ?)",
+                    (job_id, audio_path, datetime.now().isoformat())
+                )
+                # Forget the oldest finished jobs beyond the retention limit
+                self._conn.execute(
+                    "DELETE FROM transcription_jobs WHERE id IN ("
+                    "SELECT id FROM transcription_jobs WHERE status IN ('completed', 'failed') "
+                    "ORDER BY completed_at DESC LIMIT -1 OFFSET ?)",
+                    (max_finished,)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return job_id
+
+    def get(self, job_id):
+        """Return a snapshot of a job, or None if it is unknown"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, status, created_at, completed_at, transcript, error "
+                "FROM transcription_jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "id": row[0],
+            "status": row[1],
+            "created_at": datetime.fromisoformat(row[2]),
+            "completed_at": datetime.fromisoformat(row[3]) if row[3] else None,
+            "transcript": row[4],
+            "error": row[5]
+        }
+
+    def claim(self, worker):
+        """Mark the oldest queued job as processing by worker; (id, audio_path) or None"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, audio_path FROM transcription_jobs WHERE status = 'queued' "
+                    "ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE transcription_jobs SET status = 'processing', worker = ? WHERE id = ?",
+                        (worker, row[0])
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return row
+
+    def finish(self, job_id, status, transcript=None, error=None):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE transcription_jobs SET status = ?, transcript = ?, error = ?, completed_at = ? "
+                "WHERE id = ?",
+                (status, transcript, error, datetime.now().isoformat(), job_id)
+            )
+
+    def fail_lost(self, is_alive):
+        """Fail jobs whose worker process has gone away"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, worker FROM transcription_jobs WHERE status = 'processing'"
+            ).fetchall()
+        for job_id, worker in rows:
+            if worker is None or not is_alive(worker):
+                logger.error(f"Transcription job {job_id} lost its worker {worker}")
+                self.finish(job_id, "failed", error="Transcription worker exited unexpectedly")
+
+
+def _worker_loop(model_name, store_path, stopping, stages):
+    """Load Whisper once, then claim and transcribe jobs until stopping is set"""
+    import model_registry
+    import result_cache
+
+    # Already loaded when the worker was forked from a preloaded parent
+    model = model_registry.get_whisper_model(model_name)
+    cache = result_cache.get_cache()
+    store = JobStore(store_path)
+    pid = os.getpid()
+    while not stopping.is_set():
+        job = store.claim(pid)
+        if job is None:
+            stopping.wait(POLL_INTERVAL)
+            continue
+
+        job_id, audio_path = job
+        try:
+            # Measured here, recorded in the supervisor's metrics
+            with instrumentation.job("transcription", job_id=job_id, worker=pid) as timing:
+                with instrumentation.stage("load_audio"):
+                    audio = load_audio(audio_path)
+                with instrumentation.stage("transcribe"):
+                    transcript = result_cache.cached_transcribe(model, audio, model_name, cache=cache)
+            store.finish(job_id, "completed", transcript=transcript)
+            stages.put(timing.stages)
+        except Exception as e:
+            store.finish(job_id, "failed", error=str(e))
+        finally:
+            try:
+                os.remove(audio_path)
+            except OSError:
+                pass
+    store.close()
+
+
+class TranscriptionQueue:
+    """Transcription jobs shared by every API worker on a host
+
+    Any API worker can submit and poll jobs; the job state lives in a
+    JobStore file. Exactly one of them, whichever holds the lock file next
+    to the store, runs the pool of Whisper workers, so the number of loaded
+    models is bounded by `workers` however many API workers there are. If
+    that API worker exits, another takes the lock over.
+    """
+
+    def __init__(self, store_path, model_name="base", workers=2, max_pending=32, max_finished=1000,
+                 start_method="spawn"):
+        self.store_path = store_path
+        self.model_name = model_name
+        self.num_workers = workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+
+        # "fork" lets workers share weights preloaded by the parent copy-on-write
+        self._context = multiprocessing.get_context(start_method)
+
+        # Everything below is per process and created in start(): the app is
+        # imported once in the gunicorn master, before the workers fork
+        self._store = None
+        self._lock_file = None
+        self._stopping = None
+        self._stages = None
+        self._workers = []
+        self._supervisor = None
+        self._running = threading.Event()
+
+    def start(self):
+        """Open the job store and compete for running the worker pool"""
+        self._store = JobStore(self.store_path)
+        self._running.set()
+        if self.num_workers > 0:
+            self._supervisor = threading.Thread(target=self._supervise, daemon=True)
+            self._supervisor.start()
+
+    def stop(self, timeout=10):
+        """Let workers finish their current job and exit; queued jobs stay in the store"""
+        self._running.clear()
+        if self._supervisor is not None:
+            self._supervisor.join(timeout)
+        if self._stopping is not None:
+            self._stopping.set()
+        for worker in self._workers:
+            worker.join(timeout)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        if self._lock_file is not None:
+            # Closing the file releases the lock for another API worker
+            self._lock_file.close()
+            self._lock_file = None
+        if self._store is not None:
+            self._store.close()
+
+    def submit(self, audio_path):
+        """Queue a recording for transcription and return its job id"""
+        if self._store is None:
+            raise QueueFullError("Transcription queue is not running")
+        return self._store.submit(audio_path, self.max_pending, self.max_finished)
+
+    def get(self, job_id):
+        """Return a snapshot of a job, or None if it is unknown"""
+        return self._store.get(job_id)
+
+    def _acquire_pool_lock(self):
+        handle = open(self.store_path + ".lock", "a")
+        if fcntl is None:
+            return handle
+        try:
+            fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            handle.close()
+            return None
+        return handle
+
+    def _supervise(self):
+        """Take over the pool when no other API worker runs it, then keep it healthy"""
+        while self._running.is_set():
+            if self._lock_file is None:
+                self._lock_file = self._acquire_pool_lock()
+                if self._lock_file is None:
+                    time.sleep(1)
+                    continue
+                self._start_pool()
+
+            try:
+                stages = self._stages.get(timeout=1)
+            except queue.Empty:
+                self._reap_workers()
+                continue
+            except (EOFError, OSError):
+                break
+            for stage in stages:
+                instrumentation.record_stage(stage)
+
+    def _start_pool(self):
+        self._stopping = self._context.Event()
+        self._stages = self._context.Queue()
+        # Jobs a previous pool owner left half done
+        self._store.fail_lost(_pid_alive)
+        for _ in range(self.num_workers):
+            self._workers.append(self._spawn_worker())
+        logger.info(f"Started {self.num_workers} transcription workers ({self.model_name}) in {os.getpid()}")
+
+    def _spawn_worker(self):
+        worker = self._context.Process(
+            target=_worker_loop,
+            args=(self.model_name, self.store_path, self._stopping, self._stages),
+            daemon=True
+        )
+        worker.start()
+        return worker
+
+    def _reap_workers(self):
+        """Replace workers that died and fail the jobs they held"""
+        replaced = False
+        for index, worker in enumerate(self._workers):
+            if worker.is_alive():
+                continue
+            logger.error(f"Transcription worker {worker.pid} exited with code {worker.exitcode}")
+            self._workers[index] = self._spawn_worker()
+            replaced = True
+        if replaced:
+            self._store.fail_lost(_pid_alive)
@@ -1,16 +1,26 @@
 import { axiosService } from "@/api/axiosConfig";
-import { Report } from "@/types/reports";
-import { useQuery } from "@tanstack/react-query";
+import { ReportPage } from "@/types/reports";
+import { useInfiniteQuery } from "@tanstack/react-query";
 
-const getReports = async () => {
-    const response = await axiosService.get<Report[]>("reports/");
+const REPORTS_PAGE_SIZE = 50;
+
+const getReports = async (cursor: string | undefined, limit: number) => {
+    const response = await axiosService.get<ReportPage>("reports/", {
+        params: { limit, cursor },
+    });
     return response.data;
 };
 
-export const useReports = (enabled = true) => {
-    return useQuery({
-        queryKey: ["reports", "list"],
-        queryFn: getReports,
+export const useReports = (enabled = true, limit = REPORTS_PAGE_SIZE) => {
+    const query = useInfiniteQuery({
+        queryKey: ["reports", "list", limit],
+        queryFn: ({ pageParam }) => getReports(pageParam, limit),
+        initialPageParam: undefined as string | undefined,
+        getNextPageParam: (lastPage) => lastPage.next_cursor ?? undefined,
         enabled: enabled,
     });
+
+    // Pages fetched so far, flattened; call fetchNextPage() while hasNextPage
+    const reports = query.data?.pages.flatMap((page) => page.items) ?? [];
+    return { ...query, reports };
 };
@@ -3,7 +3,7 @@ import { useDocumentTitle } from "@uidotdev/usehooks";
 
 export const RecordingsList = () => {
     useDocumentTitle(generateDocumentTitle("Recordings"));
-    // const { data: reports, isError, isLoading } = useReports();
+    // const { reports, isError, isLoading } = useReports();
 
     // if (isLoading) {
     //     return (
@@ -6,7 +6,7 @@ import { useDocumentTitle } from "@uidotdev/usehooks";
 
 export const ReportsList = () => {
     useDocumentTitle(generateDocumentTitle("Reports"));
-    // const { data: reports, isError, isLoading, isSuccess } = useReports();
+    // const { reports, isError, isLoading, isSuccess, hasNextPage, fetchNextPage } = useReports();
     const mockReports = generateReports(faker.number.int({ min: 5, max: 20 }));
     console.log(mockReports);
 
@@ -31,3 +31,9 @@ export interface Report {
     doctor: Doctor;
     segments?: ReportSegment[];
 }
+
+// One page of GET /api/reports/; pass next_cursor back as `cursor` for the next
+export interface ReportPage {
+    items: Report[];
+    next_cursor?: string | null;
+}